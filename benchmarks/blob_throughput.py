@@ -0,0 +1,89 @@
+"""Measure blob upload, download and range-read throughput against a server.
+
+Start the server first, then run from the repository root:
+
+    PYTHONPATH=. python benchmarks/blob_throughput.py --size-gb 4
+
+A file of the requested size is generated in a temporary directory (or
+``--file`` is used as-is), uploaded in chunks, downloaded back in full and
+then sampled with random ``Range`` requests.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from client.src.client import MediaLabClient
+from common.constants import BLOB_CHUNK_SIZE, SERVER_URL
+
+BLOCK_SIZE = 1024 * 1024
+
+
+def generate_file(path: str, size: int) -> None:
+    block = bytearray(os.urandom(BLOCK_SIZE))
+    with open(path, "wb") as f:
+        written = 0
+        while written < size:
+            # Vary every block so the content does not compress or dedupe.
+            block[:8] = written.to_bytes(8, "little")
+            n = min(BLOCK_SIZE, size - written)
+            f.write(block[:n])
+            written += n
+
+
+def report(label: str, size: int, elapsed: float) -> None:
+    gib = size / 1024**3
+    rate = size / elapsed / (1024 * 1024)
+    print(f"{label:<10} {gib:8.2f} GiB {elapsed:8.2f} s {rate:10.1f} MiB/s")
+
+
+async def run(args: argparse.Namespace, workdir: str) -> None:
+    source = args.file or os.path.join(workdir, "source.bin")
+    if not args.file:
+        generate_file(source, int(args.size_gb * 1024**3))
+    size = os.path.getsize(source)
+    chunk_size = args.chunk_mb * 1024 * 1024
+
+    async with MediaLabClient(args.url) as client:
+        start = time.perf_counter()
+        blob = await client.upload_blob(source, chunk_size=chunk_size)
+        report("upload", size, time.perf_counter() - start)
+
+        target = os.path.join(workdir, "download.bin")
+        start = time.perf_counter()
+        await client.download_blob(blob.digest, target, chunk_size=chunk_size)
+        report("download", size, time.perf_counter() - start)
+        os.unlink(target)
+
+        if args.ranges and size:
+            total = 0
+            start = time.perf_counter()
+            for _ in range(args.ranges):
+                offset = random.randrange(size)
+                end = min(offset + chunk_size, size) - 1
+                response = await client.client.get(
+                    f"/blobs/{blob.digest}",
+                    headers={"Range": f"bytes={offset}-{end}"},
+                )
+                response.raise_for_status()
+                total += len(response.content)
+            report("ranges", total, time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=SERVER_URL)
+    parser.add_argument("--size-gb", type=float, default=2.0)
+    parser.add_argument("--file", help="Existing file to upload instead")
+    parser.add_argument("--chunk-mb", type=int, default=BLOB_CHUNK_SIZE // BLOCK_SIZE)
+    parser.add_argument("--ranges", type=int, default=100)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        asyncio.run(run(args, workdir))
+
+
+if __name__ == "__main__":
+    main()
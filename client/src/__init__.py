@@ -1,3 +1,3 @@
-from .client import Item, MediaLabClient, Notification
+from .client import BlobRef, Item, MediaLabClient, Notification
 
-__all__ = ["MediaLabClient", "Item", "Notification"]
+__all__ = ["MediaLabClient", "Item", "Notification", "BlobRef"]
@@ -1,17 +1,43 @@
+import asyncio
+import hashlib
+import os
 from datetime import datetime
 from typing import Dict, List, Optional
 
 import httpx
 from pydantic import BaseModel
 
+from common.constants import BLOB_CHUNK_SIZE, UPLOAD_OFFSET_HEADER
+from common.models import BlobRef
+from common.tracing import TracingTransport
+
 # Server configuration
 SERVER_PORT = 4800
 
+# Blob transfers can take far longer than ordinary API calls
+BLOB_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+BLOB_RETRIES = 5
+
+
+def _hash_file(path: str, chunk_size: int) -> "hashlib._Hash":
+    hasher = hashlib.sha256()
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                hasher.update(chunk)
+    return hasher
+
+
+def _write_chunk(f, hasher: "hashlib._Hash", chunk: bytes) -> None:
+    f.write(chunk)
+    hasher.update(chunk)
+
 
 class Item(BaseModel):
     id: Optional[int] = None
     name: str
     description: Optional[str] = None
+    blob: Optional[BlobRef] = None
 
 
 class Notification(BaseModel):
@@ -25,7 +51,7 @@ class Notification(BaseModel):
 class MediaLabClient:
     def __init__(self, base_url: str = f"http://localhost:{SERVER_PORT}"):
         self.base_url = base_url
-        self.client = httpx.AsyncClient(base_url=base_url)
+        self.client = httpx.AsyncClient(base_url=base_url, transport=TracingTransport())
         self.notifications: List[Notification] = []
         self._notification_id = 1
 
@@ -73,6 +99,117 @@ class MediaLabClient:
         response.raise_for_status()
         return response.json()
 
+    async def blob_exists(self, digest: str) -> bool:
+        """Check whether the server already holds a blob."""
+        response = await self.client.head(f"/blobs/{digest}")
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    async def _upload_offset(self, upload_id: str) -> int:
+        response = await self.client.get(f"/blobs/uploads/{upload_id}")
+        response.raise_for_status()
+        return response.json()["offset"]
+
+    async def upload_blob(
+        self,
+        path: str,
+        content_type: Optional[str] = None,
+        digest: Optional[str] = None,
+        upload_id: Optional[str] = None,
+        chunk_size: int = BLOB_CHUNK_SIZE,
+    ) -> BlobRef:
+        """Upload a file as a content-addressed blob.
+
+        The file is sent in ``chunk_size`` pieces; after a transport error the
+        upload resumes from the offset the server reports. Pass ``upload_id``
+        to resume an upload started earlier. If ``digest`` is known and the
+        server already holds it, nothing is sent.
+        """
+        size = os.path.getsize(path)
+        if digest is not None and await self.blob_exists(digest):
+            return BlobRef(digest=digest, size=size, content_type=content_type)
+        if upload_id is None:
+            response = await self.client.post("/blobs/uploads")
+            response.raise_for_status()
+            upload_id = response.json()["upload_id"]
+        offset = await self._upload_offset(upload_id)
+
+        retries = 0
+        with open(path, "rb") as f:
+            while offset < size:
+                f.seek(offset)
+                chunk = await asyncio.to_thread(f.read, chunk_size)
+                try:
+                    response = await self.client.patch(
+                        f"/blobs/uploads/{upload_id}",
+                        content=chunk,
+                        headers={UPLOAD_OFFSET_HEADER: str(offset)},
+                        timeout=BLOB_TIMEOUT,
+                    )
+                except httpx.TransportError:
+                    retries += 1
+                    if retries > BLOB_RETRIES:
+                        raise
+                    offset = await self._upload_offset(upload_id)
+                    continue
+                if response.status_code == 409:
+                    offset = int(response.headers[UPLOAD_OFFSET_HEADER])
+                    continue
+                response.raise_for_status()
+                offset = response.json()["offset"]
+                retries = 0
+
+        params = {}
+        if digest is not None:
+            params["digest"] = digest
+        if content_type is not None:
+            params["content_type"] = content_type
+        response = await self.client.post(
+            f"/blobs/uploads/{upload_id}/commit", params=params, timeout=BLOB_TIMEOUT
+        )
+        response.raise_for_status()
+        return BlobRef(**response.json())
+
+    async def download_blob(
+        self, digest: str, path: str, chunk_size: int = BLOB_CHUNK_SIZE
+    ) -> str:
+        """Download a blob to ``path``, resuming from any partial file there.
+
+        The finished file is checked against ``digest``.
+        """
+        hasher = None
+        retries = 0
+        while True:
+            offset = os.path.getsize(path) if os.path.exists(path) else 0
+            if hasher is None:
+                hasher = await asyncio.to_thread(_hash_file, path, chunk_size)
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                async with self.client.stream(
+                    "GET", f"/blobs/{digest}", headers=headers, timeout=BLOB_TIMEOUT
+                ) as response:
+                    if response.status_code == 416:
+                        break
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        hasher = hashlib.sha256()
+                    mode = "ab" if response.status_code == 206 else "wb"
+                    with open(path, mode) as f:
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            await asyncio.to_thread(_write_chunk, f, hasher, chunk)
+                break
+            except httpx.TransportError:
+                retries += 1
+                if retries > BLOB_RETRIES:
+                    raise
+
+        if hasher.hexdigest() != digest:
+            os.unlink(path)
+            raise ValueError(f"Downloaded content does not match blob {digest}")
+        return path
+
     def add_notification(self, notification: Notification) -> Notification:
         """Add a notification to the client's notification list."""
         notification.id = self._notification_id
@@ -8,6 +8,16 @@ import uvicorn
 from fastapi import BackgroundTasks, FastAPI, HTTPException
 from pydantic import BaseModel
 
+from common.models import BlobRef
+from common.profiling import create_profiling_router
+from common.tracing import (
+    TracingMiddleware,
+    TracingTransport,
+    configure_tracing,
+    start_span,
+    traced_async_client,
+)
+
 from .client import Item, MediaLabClient, Notification
 
 # Server configuration
@@ -19,6 +29,7 @@ class Item(BaseModel):
     id: Optional[int] = None
     name: str
     description: Optional[str] = None
+    blob: Optional[BlobRef] = None
 
 
 class Notification(BaseModel):
@@ -32,7 +43,7 @@ class Notification(BaseModel):
 class MediaLabClient:
     def __init__(self, base_url: str = f"http://localhost:{SERVER_PORT}"):
         self.base_url = base_url
-        self.client = httpx.AsyncClient(base_url=base_url)
+        self.client = httpx.AsyncClient(base_url=base_url, transport=TracingTransport())
         self.notifications: List[Notification] = []
         self._notification_id = 1
 
@@ -78,9 +89,12 @@ class MediaLabClient:
 
     def add_notification(self, notification: Notification) -> Notification:
         """Add a notification to the client's notification list."""
-        notification.id = self._notification_id
-        self._notification_id += 1
-        self.notifications.append(notification)
+        with start_span(
+            "notifications.add", attributes={"notification.type": notification.type}
+        ):
+            notification.id = self._notification_id
+            self._notification_id += 1
+            self.notifications.append(notification)
         return notification
 
     def get_notifications(self) -> List[Notification]:
@@ -98,6 +112,15 @@ app = FastAPI(
     description="Client application for MediaLab server with bidirectional communication",
     version="1.0.0",
 )
+app.include_router(
+    create_profiling_router(
+        {"notifications": lambda: client.notifications if client else []}
+    )
+)
+
+# Distributed tracing
+configure_tracing("medialab-client")
+app.add_middleware(TracingMiddleware)
 
 # Client instance
 client = None
@@ -231,9 +254,16 @@ async def receive_server_notification(
 
 async def process_notification(notification: Notification):
     """Process a notification in the background."""
-    # Simulate some processing time
-    await asyncio.sleep(1)
-    print(f"Processed notification: {notification.message}")
+    with start_span(
+        "process_notification",
+        attributes={
+            "notification.id": notification.id,
+            "notification.type": notification.type,
+        },
+    ):
+        # Simulate some processing time
+        await asyncio.sleep(1)
+        print(f"Processed notification: {notification.message}")
 
 
 @app.get("/server-communication/status")
@@ -242,7 +272,7 @@ async def get_communication_status():
     client = await get_client()
     try:
         # Try to get the server's root endpoint
-        async with httpx.AsyncClient() as test_client:
+        async with traced_async_client() as test_client:
             response = await test_client.get(f"http://localhost:{SERVER_PORT}/")
             server_status = "connected" if response.status_code == 200 else "error"
     except Exception as e:
@@ -4,7 +4,17 @@ This package contains shared models, utilities, and constants used by both
 the server and client applications.
 """
 
-from .models import Item, Notification, NotificationType, StatusResponse
+from .models import (
+    BlobRef,
+    Item,
+    Job,
+    JobCreate,
+    JobStatus,
+    JobType,
+    Notification,
+    NotificationType,
+    StatusResponse
+)
 from .constants import (
     SERVER_PORT,
     CLIENT_PORT,
@@ -12,7 +22,8 @@ from .constants import (
     CLIENT_URL,
     Endpoints,
     API_VERSION,
-    ErrorMessages
+    ErrorMessages,
+    BLOB_CHUNK_SIZE
 )
 from .utils import (
     check_service_status,
@@ -20,10 +31,24 @@ from .utils import (
     create_notification,
     format_error_response
 )
+from .profiling import create_profiling_router
+from .tracing import (
+    TracingMiddleware,
+    configure_tracing,
+    get_tracer,
+    start_span,
+    traced,
+    traced_async_client
+)
 
 __version__ = "0.1.0"
 __all__ = [
+    "BlobRef",
     "Item",
+    "Job",
+    "JobCreate",
+    "JobStatus",
+    "JobType",
     "Notification",
     "NotificationType",
     "StatusResponse",
@@ -34,8 +59,16 @@ __all__ = [
     "Endpoints",
     "API_VERSION",
     "ErrorMessages",
+    "BLOB_CHUNK_SIZE",
     "check_service_status",
     "send_notification",
     "create_notification",
-    "format_error_response"
+    "format_error_response",
+    "create_profiling_router",
+    "TracingMiddleware",
+    "configure_tracing",
+    "get_tracer",
+    "start_span",
+    "traced",
+    "traced_async_client"
 ] 
\ No newline at end of file
@@ -18,6 +18,13 @@ class Endpoints:
     SERVER_ITEMS = "/items"
     SERVER_ITEM = "/items/{item_id}"
     SERVER_CLIENT_STATUS = "/client-status"
+    SERVER_BLOBS = "/blobs"
+    SERVER_BLOB = "/blobs/{digest}"
+    SERVER_BLOB_UPLOADS = "/blobs/uploads"
+    SERVER_BLOB_UPLOAD = "/blobs/uploads/{upload_id}"
+    SERVER_BLOB_UPLOAD_COMMIT = "/blobs/uploads/{upload_id}/commit"
+    SERVER_JOBS = "/jobs"
+    SERVER_JOB = "/jobs/{job_id}"
     
     # Client endpoints
     CLIENT_ROOT = "/"
@@ -28,6 +35,34 @@ class Endpoints:
     CLIENT_NOTIFY = "/server-communication/notify"
     CLIENT_STATUS = "/server-communication/status"
 
+    # Admin endpoints (both services)
+    ADMIN_PROFILING = "/admin/profiling"
+
+# Admin configuration
+ADMIN_TOKEN_ENV = "MEDIALAB_ADMIN_TOKEN"
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+# Blob store configuration
+BLOB_DIR_ENV = "MEDIALAB_BLOB_DIR"
+DEFAULT_BLOB_DIR = "data/blobs"
+BLOB_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_OFFSET_HEADER = "Upload-Offset"
+UPLOAD_TTL_SECONDS = 24 * 60 * 60
+
+# Job scheduler configuration
+JOB_DB_ENV = "MEDIALAB_JOB_DB"
+DEFAULT_JOB_DB = "data/jobs.sqlite3"
+JOB_WORKERS_ENV = "MEDIALAB_JOB_WORKERS"
+
+# Tracing configuration
+TRACEPARENT_HEADER = "traceparent"
+TRACE_EXPORTER_ENV = "MEDIALAB_TRACE_EXPORTER"  # none, file or otlp
+TRACE_SAMPLE_RATIO_ENV = "MEDIALAB_TRACE_SAMPLE_RATIO"
+TRACE_FILE_ENV = "MEDIALAB_TRACE_FILE"
+DEFAULT_TRACE_FILE = "data/traces.jsonl"
+OTLP_ENDPOINT_ENV = "MEDIALAB_OTLP_ENDPOINT"
+DEFAULT_OTLP_ENDPOINT = "http://localhost:4318/v1/traces"
+
 # API versions
 API_VERSION = "1.0.0"
 
@@ -38,4 +73,14 @@ class ErrorMessages:
     CLIENT_NOT_AVAILABLE = "Client is not available"
     SERVER_NOT_AVAILABLE = "Server is not available"
     INVALID_REQUEST = "Invalid request"
-    INTERNAL_ERROR = "Internal server error" 
\ No newline at end of file
+    INTERNAL_ERROR = "Internal server error"
+    BLOB_NOT_FOUND = "Blob not found"
+    UPLOAD_NOT_FOUND = "Upload not found"
+    UPLOAD_OFFSET_MISMATCH = "Upload offset does not match"
+    BLOB_DIGEST_MISMATCH = "Uploaded content does not match digest"
+    RANGE_NOT_SATISFIABLE = "Requested range not satisfiable"
+    JOB_NOT_FOUND = "Job not found"
+    JOB_NOT_CANCELLABLE = "Only queued jobs can be cancelled"
+    JOB_ITEM_HAS_NO_BLOB = "Item has no blob to process"
+    ADMIN_DISABLED = "Admin endpoints are disabled"
+    ADMIN_FORBIDDEN = "Invalid admin token" 
\ No newline at end of file
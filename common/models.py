@@ -12,12 +12,49 @@ class NotificationType(str, Enum):
     SERVER_ITEM_UPDATED = "server_item_updated"
     SERVER_ITEM_DELETED = "server_item_deleted"
     SYSTEM_NOTIFICATION = "system_notification"
+    JOB_QUEUED = "job_queued"
+    JOB_PROGRESS = "job_progress"
+    JOB_COMPLETED = "job_completed"
+    JOB_FAILED = "job_failed"
+
+class JobType(str, Enum):
+    """Kinds of background media work the server can run."""
+    PROBE = "probe"
+    HASH = "hash"
+    THUMBNAIL = "thumbnail"
+    TRANSCODE = "transcode"
+
+class JobStatus(str, Enum):
+    """Lifecycle states of a background job."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class BlobRef(BaseModel):
+    """Reference to a content-addressed media blob held by the server."""
+    digest: str = Field(
+        ..., pattern=r"^[0-9a-f]{64}$", description="SHA-256 of the content"
+    )
+    size: int = Field(..., ge=0)
+    content_type: Optional[str] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "digest": "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855",
+                "size": 0,
+                "content_type": "video/mp4"
+            }
+        }
 
 class Item(BaseModel):
     """Common item model used by both server and client."""
     id: Optional[int] = None
     name: str = Field(..., min_length=1, max_length=100)
     description: Optional[str] = Field(None, max_length=500)
+    blob: Optional[BlobRef] = None
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: Optional[datetime] = None
 
@@ -62,4 +99,33 @@ class StatusResponse(BaseModel):
                 "version": "1.0.0",
                 "details": {"items_count": 5, "notifications_count": 10}
             }
-        } 
\ No newline at end of file
+        } 
+
+class JobCreate(BaseModel):
+    """Request to run a media job against an item's blob or a blob digest."""
+    type: JobType
+    item_id: Optional[int] = None
+    digest: Optional[str] = Field(None, pattern=r"^[0-9a-f]{64}$")
+    priority: int = Field(0, ge=-100, le=100, description="Higher runs first")
+    params: Dict = Field(default_factory=dict)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "type": "thumbnail",
+                "item_id": 1,
+                "priority": 10,
+                "params": {"width": 320}
+            }
+        }
+
+class Job(JobCreate):
+    """Background job as stored in the job queue."""
+    id: int
+    status: JobStatus = JobStatus.QUEUED
+    progress: float = Field(0.0, ge=0.0, le=1.0)
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,374 @@
+"""On-demand profiling endpoints shared by server and client.
+
+Nothing in this module runs until an admin request starts it: there is no
+middleware and no tracing hook, so the cost while idle is zero. Wall-clock
+profiles are written in the collapsed-stack format understood by
+``flamegraph.pl``, speedscope and inferno; CPU profiles are ``pstats`` dumps
+that open in snakeviz or flameprof.
+"""
+
+import asyncio
+import cProfile
+import gc
+import io
+import marshal
+import os
+import secrets
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from collections import Counter, OrderedDict
+from types import FrameType
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+from starlette.concurrency import run_in_threadpool
+
+from .constants import ADMIN_TOKEN_ENV, ADMIN_TOKEN_HEADER, Endpoints, ErrorMessages
+
+MAX_PROFILE_SECONDS = 300
+MAX_SNAPSHOTS = 10
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+    return f"{module}:{code.co_name}"
+
+
+class StackSampler:
+    """Wall-clock sampler that periodically records every thread's stack."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start sampling in a daemon thread."""
+        if self.running:
+            raise RuntimeError("Sampler is already running")
+        self._stop.clear()
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._run, name="medialab-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        """Stop sampling and return the collapsed stack counts."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.counts
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack: List[str] = []
+                current: Optional[FrameType] = frame
+                while current is not None:
+                    stack.append(_frame_label(current))
+                    current = current.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        """Render the samples in collapsed-stack (``stack count``) format."""
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.counts.most_common()
+        )
+
+
+def _await_chain(coro: object) -> List[FrameType]:
+    """Follow a coroutine's ``await`` chain down to the innermost frame."""
+    frames: List[FrameType] = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is not None:
+            frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+def dump_task_stacks() -> str:
+    """Describe every asyncio task on the running loop, including background tasks."""
+    tasks = sorted(asyncio.all_tasks(), key=lambda t: t.get_name())
+    out = io.StringIO()
+    out.write(f"{len(tasks)} task(s)\n")
+    for task in tasks:
+        coro = task.get_coro()
+        state = "done" if task.done() else "pending"
+        name = getattr(coro, "__qualname__", coro)
+        out.write(f"\n{task.get_name()} [{state}] {name}\n")
+        for frame in _await_chain(coro):
+            code = frame.f_code
+            out.write(f"  {code.co_filename}:{frame.f_lineno} in {code.co_name}\n")
+    return out.getvalue()
+
+
+# Objects shared across the whole process; a retained-size walk stops at them.
+SHARED_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.CodeType,
+    types.FrameType,
+)
+
+
+def retained_size(root: object) -> Tuple[int, int]:
+    """Return ``(objects, bytes)`` reachable from ``root``.
+
+    Classes, modules and functions are not counted, so the result is the
+    memory held by the data itself (e.g. every item model, its field values
+    and strings), not by the code that created it.
+    """
+    seen: Set[int] = set()
+    stack = [root]
+    objects = size = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        objects += 1
+        size += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return objects, size
+
+
+class MemorySnapshot:
+    """Retained size of each target, plus a tracemalloc heap snapshot if on."""
+
+    def __init__(self, targets: Dict[str, Tuple[int, int]]):
+        self.targets = targets
+        self.heap = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+
+
+class MemoryTracker:
+    """Snapshots of the memory retained by named in-process stores.
+
+    ``targets`` maps a name to a callable returning the store's root object
+    (e.g. the item list). Each snapshot walks the object graph below every
+    root and records how many objects and bytes it holds, which covers the
+    payloads regardless of where they were allocated. When tracemalloc is
+    running the diff also lists the top allocation sites process-wide.
+    """
+
+    def __init__(self, targets: Optional[Dict[str, Callable[[], object]]] = None):
+        self.targets = dict(targets or {})
+        self.snapshots: "OrderedDict[str, MemorySnapshot]" = OrderedDict()
+        self._started_here = False
+        self._taken = 0
+
+    def start(self, nframes: int = 25) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(nframes)
+            self._started_here = True
+
+    def stop(self) -> None:
+        if self._started_here:
+            tracemalloc.stop()
+            self._started_here = False
+        self.snapshots.clear()
+
+    def measure(self) -> MemorySnapshot:
+        return MemorySnapshot(
+            {name: retained_size(root()) for name, root in self.targets.items()}
+        )
+
+    def take(self) -> str:
+        """Take a snapshot and return its label."""
+        self._taken += 1
+        label = f"{time.strftime('%Y%m%dT%H%M%S')}-{self._taken}"
+        self.snapshots[label] = self.measure()
+        while len(self.snapshots) > MAX_SNAPSHOTS:
+            self.snapshots.popitem(last=False)
+        return label
+
+    def diff(self, base: str, target: Optional[str] = None, limit: int = 50) -> str:
+        """Compare two snapshots, or a snapshot against now."""
+        old = self.snapshots[base]
+        new = self.snapshots[target] if target else self.measure()
+        out = io.StringIO()
+        out.write(f"{'target':<20} {'objects':>10} {'delta':>10} ")
+        out.write(f"{'bytes':>14} {'delta':>14}\n")
+        for name, (objects, size) in new.targets.items():
+            old_objects, old_size = old.targets.get(name, (0, 0))
+            out.write(
+                f"{name:<20} {objects:>10} {objects - old_objects:>+10} "
+                f"{size:>14} {size - old_size:>+14}\n"
+            )
+        if old.heap is not None and new.heap is not None:
+            out.write("\nTop allocation sites (tracemalloc, whole process):\n")
+            for stat in new.heap.compare_to(old.heap, "lineno")[:limit]:
+                out.write(f"{stat}\n")
+        return out.getvalue()
+
+
+def require_admin(
+    token: Optional[str] = Header(None, alias=ADMIN_TOKEN_HEADER)
+) -> None:
+    """Only allow callers presenting the configured admin token."""
+    expected = os.environ.get(ADMIN_TOKEN_ENV)
+    if not expected:
+        raise HTTPException(status_code=403, detail=ErrorMessages.ADMIN_DISABLED)
+    if token is None or not secrets.compare_digest(token, expected):
+        raise HTTPException(status_code=403, detail=ErrorMessages.ADMIN_FORBIDDEN)
+
+
+def _download(body: bytes, filename: str, media_type: str) -> Response:
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def create_profiling_router(
+    memory_targets: Optional[Dict[str, Callable[[], object]]] = None
+) -> APIRouter:
+    """Build the admin profiling router.
+
+    ``memory_targets`` name the stores whose retained size memory snapshots
+    measure, e.g. ``{"items": lambda: items}``.
+    """
+    router = APIRouter(
+        prefix=Endpoints.ADMIN_PROFILING,
+        tags=["admin"],
+        dependencies=[Depends(require_admin)],
+    )
+    state: Dict[str, Optional[StackSampler]] = {"sampler": None}
+    memory = MemoryTracker(memory_targets)
+    # Before Python 3.12 a second cProfile.enable() silently replaces the
+    # first profiler's hook, so CPU captures are serialised here.
+    cpu_lock = asyncio.Lock()
+
+    @router.get("")
+    async def profiling_status():
+        """Report which profilers are currently active."""
+        sampler = state["sampler"]
+        return {
+            "sampler_running": bool(sampler and sampler.running),
+            "sampler_samples": sampler.samples if sampler else 0,
+            "tracemalloc_running": tracemalloc.is_tracing(),
+            "snapshots": list(memory.snapshots),
+        }
+
+    @router.post("/sampler/start")
+    async def start_sampler(interval: float = Query(0.005, gt=0, le=1)):
+        """Start the wall-clock sampler until explicitly stopped."""
+        if state["sampler"] and state["sampler"].running:
+            raise HTTPException(status_code=409, detail="Sampler is already running")
+        sampler = StackSampler(interval)
+        sampler.start()
+        state["sampler"] = sampler
+        return {"message": "Sampler started", "interval": interval}
+
+    @router.post("/sampler/stop")
+    async def stop_sampler():
+        """Stop the sampler and download the collected stacks."""
+        sampler = state["sampler"]
+        if sampler is None or not sampler.running:
+            raise HTTPException(status_code=409, detail="Sampler is not running")
+        state["sampler"] = None
+        await run_in_threadpool(sampler.stop)
+        return _download(sampler.folded().encode(), "wall.folded", "text/plain")
+
+    @router.get("/profile")
+    async def capture_profile(
+        seconds: float = Query(5.0, gt=0, le=MAX_PROFILE_SECONDS),
+        mode: str = Query("wall", pattern="^(wall|cpu)$"),
+        interval: float = Query(0.005, gt=0, le=1),
+    ):
+        """Profile for ``seconds`` and download the result.
+
+        ``wall`` samples all threads into collapsed stacks; ``cpu`` runs
+        cProfile on the event loop thread and returns a pstats dump.
+        """
+        if mode == "wall":
+            sampler = StackSampler(interval)
+            sampler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                await run_in_threadpool(sampler.stop)
+            return _download(sampler.folded().encode(), "wall.folded", "text/plain")
+
+        if cpu_lock.locked():
+            raise HTTPException(status_code=409, detail="Another profiler is active")
+        async with cpu_lock:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                raise HTTPException(
+                    status_code=409, detail="Another profiler is active"
+                )
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+        profiler.create_stats()
+        return _download(
+            marshal.dumps(profiler.stats), "cpu.prof", "application/octet-stream"
+        )
+
+    @router.get("/tasks", response_class=PlainTextResponse)
+    async def task_stacks():
+        """Dump the await chain of every asyncio task."""
+        return dump_task_stacks()
+
+    @router.post("/memory/start")
+    async def start_memory(nframes: int = Query(25, ge=1, le=100)):
+        """Start tracemalloc so diffs also list allocation sites."""
+        memory.start(nframes)
+        return {
+            "message": "tracemalloc started",
+            "nframes": tracemalloc.get_traceback_limit(),
+        }
+
+    @router.post("/memory/stop")
+    async def stop_memory():
+        """Stop tracemalloc and discard stored snapshots."""
+        memory.stop()
+        return {"message": "tracemalloc stopped"}
+
+    @router.post("/memory/snapshots")
+    async def take_snapshot():
+        """Measure the retained size of every memory target."""
+        label = await run_in_threadpool(memory.take)
+        return {"snapshot": label, "snapshots": list(memory.snapshots)}
+
+    @router.get("/memory/diff")
+    async def diff_snapshots(
+        base: str,
+        target: Optional[str] = None,
+        limit: int = Query(50, ge=1, le=1000),
+    ):
+        """Download the allocation diff between two snapshots, or base and now."""
+        known = memory.snapshots
+        if base not in known or (target and target not in known):
+            raise HTTPException(status_code=404, detail="Snapshot not found")
+        report = await run_in_threadpool(memory.diff, base, target, limit)
+        return _download(report.encode(), "memory.diff", "text/plain")
+
+    return router
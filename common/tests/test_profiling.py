@@ -0,0 +1,62 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from common.constants import ADMIN_TOKEN_ENV, ADMIN_TOKEN_HEADER
+from common.profiling import MemoryTracker, create_profiling_router, retained_size
+from common.models import Item
+
+
+def test_retained_size_counts_nested_payloads():
+    items = []
+    empty_objects, empty_size = retained_size(items)
+    items.extend(Item(name=f"item {i}", description="x" * 400) for i in range(10))
+    objects, size = retained_size(items)
+    assert objects > empty_objects + 10
+    assert size - empty_size > 10 * 400
+
+
+def test_retained_size_counts_shared_objects_once():
+    payload = "y" * 1000
+    _, single = retained_size([payload])
+    _, shared = retained_size([payload, payload])
+    assert shared - single < 100
+
+
+def test_memory_diff_reports_growth_per_target():
+    notifications = []
+    tracker = MemoryTracker({"notifications": lambda: notifications})
+    base = tracker.take()
+    notifications.extend(f"{i:03}" + "z" * 500 for i in range(20))
+    report = tracker.diff(base)
+    line = next(l for l in report.splitlines() if l.startswith("notifications"))
+    objects, objects_delta, size, size_delta = line.split()[1:]
+    assert int(objects_delta) == 20
+    assert int(size_delta) > 20 * 500
+
+
+def test_snapshots_are_capped():
+    tracker = MemoryTracker({"empty": list})
+    labels = [tracker.take() for _ in range(15)]
+    assert list(tracker.snapshots) == labels[-10:]
+
+
+async def test_overlapping_cpu_profiles_are_rejected(monkeypatch):
+    monkeypatch.setenv(ADMIN_TOKEN_ENV, "secret")
+    app = FastAPI()
+    app.include_router(create_profiling_router())
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://test",
+        headers={ADMIN_TOKEN_HEADER: "secret"},
+    ) as client:
+        params = {"mode": "cpu", "seconds": 0.3}
+        first = asyncio.create_task(
+            client.get("/admin/profiling/profile", params=params)
+        )
+        await asyncio.sleep(0.1)
+        second = await client.get("/admin/profiling/profile", params=params)
+        assert second.status_code == 409
+        assert (await first).status_code == 200
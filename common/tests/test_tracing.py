@@ -0,0 +1,164 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from common import tracing
+from common.constants import TRACEPARENT_HEADER
+from common.tracing import (
+    SpanContext,
+    Tracer,
+    TracingMiddleware,
+    TracingTransport,
+    current_span,
+    traced_async_client,
+)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+SPAN_ID = "00f067aa0ba902b7"
+
+
+class CollectingProcessor:
+    def __init__(self):
+        self.spans = []
+
+    def on_end(self, span):
+        self.spans.append(span)
+
+
+@pytest.fixture
+def processor(monkeypatch):
+    processor = CollectingProcessor()
+    monkeypatch.setattr(tracing, "_tracer", Tracer("test", 1.0, processor))
+    return processor
+
+
+def test_traceparent_round_trip():
+    context = SpanContext.from_traceparent(f"00-{TRACE_ID}-{SPAN_ID}-01")
+    assert (context.trace_id, context.span_id, context.sampled) == (
+        TRACE_ID,
+        SPAN_ID,
+        True,
+    )
+    assert context.to_traceparent() == f"00-{TRACE_ID}-{SPAN_ID}-01"
+    unsampled = SpanContext(TRACE_ID, SPAN_ID, False)
+    assert unsampled.to_traceparent().endswith("-00")
+
+
+@pytest.mark.parametrize(
+    "header, sampled",
+    [
+        (f"00-{TRACE_ID}-{SPAN_ID}-00", False),
+        (f"00-{TRACE_ID}-{SPAN_ID}-03", True),
+        (f" 00-{TRACE_ID.upper()}-{SPAN_ID}-01 ", True),
+    ],
+)
+def test_traceparent_flags(header, sampled):
+    assert SpanContext.from_traceparent(header).sampled is sampled
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        None,
+        "",
+        "garbage",
+        f"00-{TRACE_ID}-{SPAN_ID}",
+        f"00-{TRACE_ID[:-1]}-{SPAN_ID}-01",
+        f"00-{TRACE_ID}-{SPAN_ID}-zz",
+        f"00-{'0' * 32}-{SPAN_ID}-01",
+        f"00-{TRACE_ID}-{'0' * 16}-01",
+    ],
+)
+def test_malformed_traceparent_is_ignored(header):
+    assert SpanContext.from_traceparent(header) is None
+
+
+def test_ratio_sampling():
+    processor = CollectingProcessor()
+    never = Tracer("test", 0.0, processor)
+    always = Tracer("test", 1.0, processor)
+    for _ in range(20):
+        with never.start_span("dropped") as span:
+            assert not span.context.sampled
+        with always.start_span("kept") as span:
+            assert span.context.sampled
+    assert [span.name for span in processor.spans] == ["kept"] * 20
+
+    half = Tracer("test", 0.5, processor)
+    decisions = []
+    for _ in range(400):
+        with half.start_span("maybe") as span:
+            decisions.append(span.context.sampled)
+    assert 100 < sum(decisions) < 300
+
+
+def test_sampling_without_exporter_still_marks_traces_sampled():
+    tracer = Tracer("test", 1.0, None)
+    with tracer.start_span("root") as span:
+        assert span.context.sampled
+        assert span.context.to_traceparent().endswith("-01")
+
+
+def test_children_follow_parent_decision():
+    tracer = Tracer("test", 0.0, CollectingProcessor())
+    parent = SpanContext(TRACE_ID, SPAN_ID, True)
+    with tracer.start_span("child", parent=parent) as span:
+        assert span.context.sampled
+        assert span.context.trace_id == TRACE_ID
+        with tracer.start_span("grandchild") as inner:
+            assert inner.context.sampled
+            assert inner.parent_id == span.context.span_id
+
+    tracer = Tracer("test", 1.0, CollectingProcessor())
+    with tracer.start_span(
+        "child", parent=SpanContext(TRACE_ID, SPAN_ID, False)
+    ) as span:
+        assert not span.context.sampled
+
+
+def test_middleware_continues_incoming_trace(processor):
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"trace_id": current_span().context.trace_id}
+
+    client = TestClient(app)
+    response = client.get(
+        "/items/1", headers={TRACEPARENT_HEADER: f"00-{TRACE_ID}-{SPAN_ID}-01"}
+    )
+    assert response.json() == {"trace_id": TRACE_ID}
+    (span,) = processor.spans
+    assert span.name == "GET /items/{item_id}"
+    assert span.parent_id == SPAN_ID
+    assert span.attributes["http.status_code"] == 200
+
+
+async def test_transport_injects_traceparent(processor):
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers[TRACEPARENT_HEADER])
+        return httpx.Response(200)
+
+    client = traced_async_client(transport=httpx.MockTransport(handler))
+    async with client:
+        with tracing.start_span("caller") as caller:
+            await client.get("http://service/items")
+
+    (header,) = seen
+    context = SpanContext.from_traceparent(header)
+    assert context.trace_id == caller.context.trace_id
+    request_span = next(span for span in processor.spans if span.name != "caller")
+    assert request_span.context.span_id == context.span_id
+    assert request_span.parent_id == caller.context.span_id
+
+
+def test_client_options_configure_wrapped_transport():
+    limits = httpx.Limits(max_connections=3)
+    client = traced_async_client(limits=limits, http2=False, verify=False)
+    assert isinstance(client._transport, TracingTransport)
+    pool = client._transport.transport._pool
+    assert pool._max_connections == 3
@@ -0,0 +1,487 @@
+"""Lightweight distributed tracing shared by server and client.
+
+Trace context follows the W3C ``traceparent`` format, so it survives the
+HTTP hop between the services (and any proxy that understands it). Spans
+are kept in a context variable, which means background tasks started while
+handling a request become children of that request's span.
+
+Configuration comes from the environment when :func:`configure_tracing` is
+called:
+
+- ``MEDIALAB_TRACE_EXPORTER``: ``none`` (default), ``file`` or ``otlp``
+- ``MEDIALAB_TRACE_SAMPLE_RATIO``: fraction of new traces to record (1.0)
+- ``MEDIALAB_TRACE_FILE``: JSON-lines output for the ``file`` exporter
+- ``MEDIALAB_OTLP_ENDPOINT``: OTLP/HTTP JSON endpoint for ``otlp``
+
+Sampling is decided once per trace, at its root, and inherited from the
+``traceparent`` flags by everything downstream.
+"""
+
+import atexit
+import functools
+import inspect
+import json
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional
+
+import httpx
+
+from .constants import (
+    DEFAULT_OTLP_ENDPOINT,
+    DEFAULT_TRACE_FILE,
+    OTLP_ENDPOINT_ENV,
+    TRACE_EXPORTER_ENV,
+    TRACE_FILE_ENV,
+    TRACE_SAMPLE_RATIO_ENV,
+    TRACEPARENT_HEADER,
+)
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# Spans are exported in batches of up to this size, at least this often.
+EXPORT_BATCH_SIZE = 256
+EXPORT_INTERVAL = 1.0
+
+
+class SpanKind(str, Enum):
+    """Role of a span in a request, as in OpenTelemetry."""
+
+    INTERNAL = "internal"
+    SERVER = "server"
+    CLIENT = "client"
+
+
+class SpanContext:
+    """Identifiers that are propagated between services."""
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def to_traceparent(self) -> str:
+        flags = "01" if self.sampled else "00"
+        return f"00-{self.trace_id}-{self.span_id}-{flags}"
+
+    @classmethod
+    def from_traceparent(cls, header: Optional[str]) -> Optional["SpanContext"]:
+        """Parse a ``traceparent`` header, ignoring anything malformed."""
+        match = TRACEPARENT_RE.match((header or "").strip().lower())
+        if match is None:
+            return None
+        trace_id, span_id, flags = match.groups()
+        if trace_id == "0" * 32 or span_id == "0" * 16:
+            return None
+        return cls(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        context: SpanContext,
+        parent_id: Optional[str],
+        kind: SpanKind,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.error: Optional[str] = None
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.context.sampled:
+            self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        self.error = message
+
+    def end(self) -> None:
+        """Finish the span; calling it again has no effect."""
+        if self.end_time is not None:
+            return
+        self.end_time = time.time_ns()
+        if self.context.sampled:
+            self.tracer.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        end_time = self.end_time or time.time_ns()
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind.value,
+            "service": self.tracer.service_name,
+            "start_time_unix_nano": self.start_time,
+            "end_time_unix_nano": end_time,
+            "duration_ms": (end_time - self.start_time) / 1e6,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar(
+    "medialab_current_span", default=None
+)
+
+
+def current_span() -> Optional[Span]:
+    """Return the innermost active span, if any."""
+    return _current_span.get()
+
+
+class FileSpanExporter:
+    """Append finished spans to a JSON-lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "a") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPSpanExporter:
+    """POST finished spans to an OTLP/HTTP collector using the JSON encoding."""
+
+    KINDS = {SpanKind.INTERNAL: 1, SpanKind.SERVER: 2, SpanKind.CLIENT: 3}
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.client = httpx.Client(timeout=timeout)
+
+    def _span(self, span: Span) -> Dict[str, Any]:
+        encoded: Dict[str, Any] = {
+            "traceId": span.context.trace_id,
+            "spanId": span.context.span_id,
+            "name": span.name,
+            "kind": self.KINDS[span.kind],
+            "startTimeUnixNano": str(span.start_time),
+            "endTimeUnixNano": str(span.end_time),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in span.attributes.items()
+            ],
+            "status": {"code": 2, "message": span.error} if span.error else {},
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = span.parent_id
+        return encoded
+
+    def export(self, spans: List[Span]) -> None:
+        service_name = spans[0].tracer.service_name
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": service_name},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "medialab"},
+                            "spans": [self._span(span) for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        self.client.post(self.endpoint, json=payload).raise_for_status()
+
+
+class BatchSpanProcessor:
+    """Hand finished spans to an exporter from a background thread.
+
+    Ending a span only enqueues it, so request handlers never wait on disk or
+    network I/O for tracing.
+    """
+
+    def __init__(self, exporter: Any):
+        self.exporter = exporter
+        self._queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(
+            target=self._run, name="medialab-span-export", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def on_end(self, span: Span) -> None:
+        self._queue.put(span)
+
+    def _flush(self, batch: List[Span]) -> None:
+        if not batch:
+            return
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            print(f"Failed to export {len(batch)} spans: {e}")
+        batch.clear()
+
+    def _run(self) -> None:
+        batch: List[Span] = []
+        deadline = time.monotonic() + EXPORT_INTERVAL
+        while True:
+            try:
+                span = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                span = None
+            else:
+                if span is None:
+                    self._flush(batch)
+                    return
+                batch.append(span)
+            if len(batch) >= EXPORT_BATCH_SIZE or time.monotonic() >= deadline:
+                self._flush(batch)
+                deadline = time.monotonic() + EXPORT_INTERVAL
+
+    def shutdown(self) -> None:
+        """Export whatever is still queued and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5.0)
+
+
+class Tracer:
+    """Creates spans and forwards sampled ones to a processor."""
+
+    def __init__(
+        self,
+        service_name: str = "medialab",
+        sample_ratio: float = 1.0,
+        processor: Optional[BatchSpanProcessor] = None,
+    ):
+        self.service_name = service_name
+        self.sample_ratio = min(max(sample_ratio, 0.0), 1.0)
+        self.processor = processor
+
+    def _sample(self, trace_id: str) -> bool:
+        # Deterministic in the trace id, like OpenTelemetry's ratio sampler.
+        # Decided even without an exporter: downstream services follow the
+        # propagated flag and may be exporting.
+        return int(trace_id[16:], 16) < self.sample_ratio * 2**64
+
+    def export(self, span: Span) -> None:
+        if self.processor is not None:
+            self.processor.on_end(span)
+
+    @contextmanager
+    def start_span(
+        self,
+        name: str,
+        kind: SpanKind = SpanKind.INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+        parent: Optional[SpanContext] = None,
+    ) -> Iterator[Span]:
+        """Run the block inside a new span, a child of ``parent`` or the current one.
+
+        Exceptions escaping the block are recorded on the span and re-raised.
+        """
+        if parent is None and (active := _current_span.get()) is not None:
+            parent = active.context
+        if parent is None:
+            trace_id = secrets.token_hex(16)
+            context = SpanContext(
+                trace_id, secrets.token_hex(8), self._sample(trace_id)
+            )
+        else:
+            context = SpanContext(parent.trace_id, secrets.token_hex(8), parent.sampled)
+        span = Span(
+            self,
+            name,
+            context,
+            parent.span_id if parent else None,
+            kind,
+            attributes if context.sampled else None,
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.set_error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer."""
+    return _tracer
+
+
+def configure_tracing(service_name: str) -> Tracer:
+    """Build the process-wide tracer from the environment."""
+    global _tracer
+    exporter_name = os.environ.get(TRACE_EXPORTER_ENV, "none").lower()
+    exporter: Any = None
+    if exporter_name == "file":
+        exporter = FileSpanExporter(os.environ.get(TRACE_FILE_ENV, DEFAULT_TRACE_FILE))
+    elif exporter_name == "otlp":
+        exporter = OTLPSpanExporter(
+            os.environ.get(OTLP_ENDPOINT_ENV, DEFAULT_OTLP_ENDPOINT)
+        )
+    _tracer = Tracer(
+        service_name,
+        float(os.environ.get(TRACE_SAMPLE_RATIO_ENV, 1.0)),
+        BatchSpanProcessor(exporter) if exporter is not None else None,
+    )
+    return _tracer
+
+
+def start_span(
+    name: str,
+    kind: SpanKind = SpanKind.INTERNAL,
+    attributes: Optional[Dict[str, Any]] = None,
+    parent: Optional[SpanContext] = None,
+) -> ContextManager[Span]:
+    """Start a span on the process-wide tracer."""
+    return _tracer.start_span(name, kind, attributes, parent)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator wrapping each call of a function (sync or async) in a span."""
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(span_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span for every HTTP request.
+
+    The span continues an incoming ``traceparent`` and ends once the response
+    body has been sent; background tasks that run afterwards still see it as
+    their parent.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        parent = SpanContext.from_traceparent(
+            headers.get(TRACEPARENT_HEADER.encode(), b"").decode("latin-1")
+        )
+        method = scope["method"]
+        attributes = {"http.method": method, "http.target": scope["path"]}
+        with start_span(
+            f"{method} {scope['path']}", SpanKind.SERVER, attributes, parent
+        ) as span:
+
+            async def traced_send(message: Dict) -> None:
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    span.set_attribute("http.status_code", status)
+                    if status >= 500:
+                        span.set_error(f"HTTP {status}")
+                await send(message)
+                if message["type"] == "http.response.body" and not message.get(
+                    "more_body", False
+                ):
+                    route = scope.get("route")
+                    if route is not None:
+                        span.name = f"{method} {getattr(route, 'path', route)}"
+                    span.end()
+
+            await self.app(scope, receive, traced_send)
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """httpx transport that wraps each request in a client span.
+
+    The outgoing request carries the span's ``traceparent`` so the receiving
+    service continues the same trace.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attributes = {"http.method": request.method, "http.url": str(request.url)}
+        with start_span(
+            f"HTTP {request.method} {request.url.path}", SpanKind.CLIENT, attributes
+        ) as span:
+            request.headers[TRACEPARENT_HEADER] = span.context.to_traceparent()
+            response = await self.transport.handle_async_request(request)
+            span.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 500:
+                span.set_error(f"HTTP {response.status_code}")
+            return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+# ``httpx.AsyncClient`` options that configure its default transport.
+TRANSPORT_OPTIONS = ("verify", "cert", "http1", "http2", "limits", "trust_env")
+
+
+def traced_async_client(**kwargs: Any) -> httpx.AsyncClient:
+    """Create an ``httpx.AsyncClient`` whose requests propagate trace context.
+
+    A ``transport`` argument is wrapped; otherwise the wrapped transport is
+    built from the same connection options the client would have used.
+    """
+    transport = kwargs.pop("transport", None)
+    if transport is None:
+        options = {key: kwargs[key] for key in TRANSPORT_OPTIONS if key in kwargs}
+        transport = httpx.AsyncHTTPTransport(**options)
+    return httpx.AsyncClient(transport=TracingTransport(transport), **kwargs)
@@ -1,14 +1,14 @@
 """Common utilities used by both server and client."""
-import httpx
 from typing import Optional, Dict, Any
 from datetime import datetime
 from .constants import SERVER_URL, CLIENT_URL, ErrorMessages
 from .models import StatusResponse, Notification, NotificationType
+from .tracing import traced_async_client
 
 async def check_service_status(url: str) -> StatusResponse:
     """Check the status of a service (server or client)."""
     try:
-        async with httpx.AsyncClient() as client:
+        async with traced_async_client() as client:
             response = await client.get(f"{url}/")
             response.raise_for_status()
             data = response.json()
@@ -31,7 +31,7 @@ async def send_notification(
 ) -> Optional[Notification]:
     """Send a notification to a service."""
     try:
-        async with httpx.AsyncClient() as client:
+        async with traced_async_client() as client:
             response = await client.post(
                 f"{target_url}/server-communication/notify",
                 json=notification.model_dump(),
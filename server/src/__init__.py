@@ -1,3 +1,11 @@
-from .main import Item, Notification, app
-
 __all__ = ["app", "Item", "Notification"]
+
+
+def __getattr__(name):
+    # Imported lazily so job worker processes, which unpickle functions from
+    # ``src.media_tasks``, do not build the app and its scheduler.
+    if name in __all__:
+        from . import main
+
+        return getattr(main, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,473 @@
+"""Content-addressed media blob store.
+
+Blobs are keyed by the SHA-256 of their content and stored once under
+``objects/<first two hex chars>/<digest>``, so identical uploads are
+deduplicated. Uploads are chunked and resumable: each ``PATCH`` appends the
+request body at the offset given in ``Upload-Offset`` while the digest is
+computed incrementally off the event loop. Downloads honour single HTTP
+ranges and are sent with the ASGI zero-copy extension (``sendfile``) when
+the server offers it, or as memory-mapped slices otherwise.
+"""
+
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import time
+import uuid
+from functools import partial
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import anyio
+from fastapi import APIRouter, Header, HTTPException, Path, Query, Request
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from common.constants import (
+    UPLOAD_OFFSET_HEADER,
+    UPLOAD_TTL_SECONDS,
+    Endpoints,
+    ErrorMessages,
+)
+from common.models import BlobRef
+from common.tracing import traced
+
+DIGEST_PATTERN = r"^[0-9a-f]{64}$"
+UPLOAD_ID_PATTERN = r"^[0-9a-f]{32}$"
+
+# Bytes buffered before handing a write to the threadpool, and bytes per
+# body message when a download falls back to mmap reads.
+WRITE_BUFFER_SIZE = 1024 * 1024
+SEND_CHUNK_SIZE = 1024 * 1024
+HASH_READ_SIZE = 8 * 1024 * 1024
+
+# Abandoned uploads are swept at most this often.
+SWEEP_INTERVAL = 15 * 60
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+
+
+def hash_file(path: str) -> "hashlib._Hash":
+    """Return a SHA-256 hasher fed with the whole file at ``path``."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_READ_SIZE):
+            hasher.update(chunk)
+    return hasher
+
+
+class UploadOffsetMismatch(Exception):
+    """Raised when a chunk does not start where the upload currently ends."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+
+class BlobStore:
+    """Local-disk store of SHA-256 addressed blobs with resumable uploads."""
+
+    def __init__(self, root: str, upload_ttl: float = UPLOAD_TTL_SECONDS):
+        self.root = os.path.abspath(root)
+        self.upload_ttl = upload_ttl
+        self._last_sweep = 0.0
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.uploads_dir = os.path.join(self.root, "uploads")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        self._hashers: Dict[str, "hashlib._Hash"] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def meta_path(self, digest: str) -> str:
+        return self.blob_path(digest) + ".json"
+
+    def content_type(self, digest: str) -> Optional[str]:
+        """Return the content type recorded when the blob was stored."""
+        try:
+            with open(self.meta_path(digest)) as f:
+                return json.load(f).get("content_type")
+        except FileNotFoundError:
+            return None
+
+    def _store(self, path: str, digest: str, content_type: Optional[str]) -> None:
+        # Move ``path`` into place (or drop it if the content is already
+        # stored) and keep the first content type given for the digest.
+        target = self.blob_path(digest)
+        if os.path.exists(target):
+            os.unlink(path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+        if content_type and self.content_type(digest) is None:
+            staging = f"{self.meta_path(digest)}.{uuid.uuid4().hex}"
+            with open(staging, "w") as f:
+                json.dump({"content_type": content_type}, f)
+            os.replace(staging, self.meta_path(digest))
+
+    def upload_path(self, upload_id: str) -> str:
+        return os.path.join(self.uploads_dir, upload_id)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.isfile(self.blob_path(digest))
+
+    def size(self, digest: str) -> int:
+        return os.path.getsize(self.blob_path(digest))
+
+    def create_upload(self) -> str:
+        """Start a new upload and return its id."""
+        upload_id = uuid.uuid4().hex
+        open(self.upload_path(upload_id), "xb").close()
+        self._hashers[upload_id] = hashlib.sha256()
+        return upload_id
+
+    def upload_offset(self, upload_id: str) -> int:
+        """Return how many bytes of an upload have been received."""
+        try:
+            return os.path.getsize(self.upload_path(upload_id))
+        except FileNotFoundError:
+            raise KeyError(upload_id)
+
+    def _lock(self, upload_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(upload_id, asyncio.Lock())
+
+    async def _hasher(self, upload_id: str) -> "hashlib._Hash":
+        # Hash state lives in memory only; after a restart it is rebuilt from
+        # the bytes already on disk the first time the upload is resumed.
+        if upload_id not in self._hashers:
+            self._hashers[upload_id] = await run_in_threadpool(
+                hash_file, self.upload_path(upload_id)
+            )
+        return self._hashers[upload_id]
+
+    @traced("blobs.append")
+    async def append(
+        self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]
+    ) -> int:
+        """Append a stream of bytes at ``offset`` and return the new offset.
+
+        Whatever arrived before the client disconnected is kept, so it can
+        query the offset and resume from there.
+        """
+        self.upload_offset(upload_id)
+        async with self._lock(upload_id):
+            current = self.upload_offset(upload_id)
+            if offset != current:
+                raise UploadOffsetMismatch(current)
+            hasher = await self._hasher(upload_id)
+
+            def write(f, data: bytes) -> None:
+                try:
+                    f.write(data)
+                except BaseException:
+                    # The file may now hold part of ``data``; rebuild the
+                    # hash from disk on the next attempt.
+                    self._hashers.pop(upload_id, None)
+                    raise
+                hasher.update(data)
+
+            with open(self.upload_path(upload_id), "ab") as f:
+                buffer = bytearray()
+                try:
+                    async for chunk in chunks:
+                        buffer += chunk
+                        if len(buffer) >= WRITE_BUFFER_SIZE:
+                            await run_in_threadpool(write, f, bytes(buffer))
+                            buffer.clear()
+                except ClientDisconnect:
+                    pass
+                if buffer:
+                    await run_in_threadpool(write, f, bytes(buffer))
+            return self.upload_offset(upload_id)
+
+    @traced("blobs.commit")
+    async def commit(
+        self,
+        upload_id: str,
+        digest: Optional[str] = None,
+        content_type: Optional[str] = None,
+    ) -> BlobRef:
+        """Finish an upload, verifying ``digest`` if given, and store the blob."""
+        self.upload_offset(upload_id)
+        async with self._lock(upload_id):
+            size = self.upload_offset(upload_id)
+            actual = (await self._hasher(upload_id)).hexdigest()
+            if digest is not None and digest != actual:
+                raise ValueError(actual)
+            self._store(self.upload_path(upload_id), actual, content_type)
+            self._hashers.pop(upload_id, None)
+        self._locks.pop(upload_id, None)
+        return BlobRef(digest=actual, size=size, content_type=self.content_type(actual))
+
+    def add_file(self, path: str, content_type: Optional[str] = None) -> BlobRef:
+        """Move a local file into the store, e.g. output produced by a job.
+
+        This is synchronous so it can run inside worker processes.
+        """
+        digest = hash_file(path).hexdigest()
+        size = os.path.getsize(path)
+        self._store(path, digest, content_type)
+        return BlobRef(digest=digest, size=size, content_type=self.content_type(digest))
+
+    def abort(self, upload_id: str) -> None:
+        """Discard an upload and everything received for it."""
+        try:
+            os.unlink(self.upload_path(upload_id))
+        except FileNotFoundError:
+            raise KeyError(upload_id)
+        self._hashers.pop(upload_id, None)
+        self._locks.pop(upload_id, None)
+
+    def sweep_uploads(self, force: bool = False) -> int:
+        """Delete uploads untouched for ``upload_ttl`` seconds.
+
+        Runs at most every ``SWEEP_INTERVAL`` unless ``force`` is set, and
+        also clears temporary output left behind by interrupted jobs.
+        Returns the number of entries removed.
+        """
+        now = time.time()
+        if not force and now - self._last_sweep < SWEEP_INTERVAL:
+            return 0
+        self._last_sweep = now
+        removed = 0
+        for entry in os.scandir(self.uploads_dir):
+            lock = self._locks.get(entry.name)
+            if lock is not None and lock.locked():
+                continue
+            try:
+                if now - entry.stat().st_mtime < self.upload_ttl:
+                    continue
+                if entry.is_dir():
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                continue
+            self._hashers.pop(entry.name, None)
+            self._locks.pop(entry.name, None)
+            removed += 1
+        return removed
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a ``Range`` header into an inclusive ``(start, end)`` pair.
+
+    Returns ``None`` when the header should be ignored (malformed or
+    multi-range) and raises ``ValueError`` when it cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start > end and first and last:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+
+class BlobResponse(Response):
+    """Send a byte range of a blob without buffering it in Python."""
+
+    def __init__(
+        self,
+        path: str,
+        start: int,
+        length: int,
+        status_code: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+        media_type: str = DEFAULT_CONTENT_TYPE,
+    ):
+        self.path = path
+        self.start = start
+        self.length = length
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers["content-length"] = str(length)
+
+    async def _send_body(self, scope: Scope, send: Send) -> None:
+        if self.length == 0 or scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send(
+                    {
+                        "type": "http.response.zerocopysend",
+                        "file": f,
+                        "offset": self.start,
+                        "count": self.length,
+                    }
+                )
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                position, end = self.start, self.start + self.length
+                while position < end:
+                    stop = min(position + SEND_CHUNK_SIZE, end)
+                    # Slicing may fault pages in from disk, so keep it off the
+                    # event loop.
+                    body = await run_in_threadpool(
+                        mapped.__getitem__, slice(position, stop)
+                    )
+                    position = stop
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": body,
+                            "more_body": position < end,
+                        }
+                    )
+
+    async def _stream(self, scope: Scope, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        await self._send_body(scope, send)
+
+    async def _listen_for_disconnect(self, receive: Receive) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        async with anyio.create_task_group() as task_group:
+
+            async def wrap(func) -> None:
+                await func()
+                task_group.cancel_scope.cancel()
+
+            task_group.start_soon(wrap, partial(self._stream, scope, send))
+            await wrap(partial(self._listen_for_disconnect, receive))
+
+
+def create_blob_router(store: BlobStore) -> APIRouter:
+    """Build the router exposing ``store`` over HTTP."""
+    router = APIRouter(tags=["blobs"])
+
+    def offset_response(upload_id: str) -> dict:
+        return {"upload_id": upload_id, "offset": store.upload_offset(upload_id)}
+
+    @router.post(Endpoints.SERVER_BLOB_UPLOADS, status_code=201)
+    async def create_upload():
+        """Start a resumable upload."""
+        await run_in_threadpool(store.sweep_uploads)
+        return offset_response(store.create_upload())
+
+    @router.get(Endpoints.SERVER_BLOB_UPLOAD)
+    async def get_upload(upload_id: str = Path(..., pattern=UPLOAD_ID_PATTERN)):
+        """Report how many bytes of an upload the server holds."""
+        try:
+            return offset_response(upload_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=ErrorMessages.UPLOAD_NOT_FOUND)
+
+    @router.patch(Endpoints.SERVER_BLOB_UPLOAD)
+    async def append_upload(
+        request: Request,
+        upload_id: str = Path(..., pattern=UPLOAD_ID_PATTERN),
+        upload_offset: int = Header(..., alias=UPLOAD_OFFSET_HEADER, ge=0),
+    ):
+        """Append the raw request body to an upload at ``Upload-Offset``."""
+        try:
+            offset = await store.append(upload_id, upload_offset, request.stream())
+        except KeyError:
+            raise HTTPException(status_code=404, detail=ErrorMessages.UPLOAD_NOT_FOUND)
+        except UploadOffsetMismatch as e:
+            raise HTTPException(
+                status_code=409,
+                detail=ErrorMessages.UPLOAD_OFFSET_MISMATCH,
+                headers={UPLOAD_OFFSET_HEADER: str(e.offset)},
+            )
+        return {"upload_id": upload_id, "offset": offset}
+
+    @router.post(Endpoints.SERVER_BLOB_UPLOAD_COMMIT, response_model=BlobRef)
+    async def commit_upload(
+        upload_id: str = Path(..., pattern=UPLOAD_ID_PATTERN),
+        digest: Optional[str] = Query(None, pattern=DIGEST_PATTERN),
+        content_type: Optional[str] = None,
+    ):
+        """Finish an upload and return the stored blob reference."""
+        try:
+            return await store.commit(upload_id, digest, content_type)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=ErrorMessages.UPLOAD_NOT_FOUND)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=422,
+                detail={
+                    "message": ErrorMessages.BLOB_DIGEST_MISMATCH,
+                    "digest": str(e),
+                },
+            )
+
+    @router.delete(Endpoints.SERVER_BLOB_UPLOAD)
+    async def abort_upload(upload_id: str = Path(..., pattern=UPLOAD_ID_PATTERN)):
+        """Discard an unfinished upload."""
+        try:
+            store.abort(upload_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=ErrorMessages.UPLOAD_NOT_FOUND)
+        return {"message": "Upload aborted"}
+
+    @router.api_route(Endpoints.SERVER_BLOB, methods=["GET", "HEAD"])
+    async def get_blob(
+        digest: str = Path(..., pattern=DIGEST_PATTERN),
+        range_header: Optional[str] = Header(None, alias="Range"),
+        if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    ):
+        """Download a blob, honouring a single HTTP ``Range``."""
+        if not store.exists(digest):
+            raise HTTPException(status_code=404, detail=ErrorMessages.BLOB_NOT_FOUND)
+        size = store.size(digest)
+        media_type = store.content_type(digest) or DEFAULT_CONTENT_TYPE
+        headers = {
+            "accept-ranges": "bytes",
+            "etag": f'"{digest}"',
+            "cache-control": "public, max-age=31536000, immutable",
+        }
+        if if_none_match is not None and if_none_match.strip('W/ "') == digest:
+            return Response(status_code=304, headers=headers)
+        byte_range = None
+        if range_header:
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                raise HTTPException(
+                    status_code=416,
+                    detail=ErrorMessages.RANGE_NOT_SATISFIABLE,
+                    headers={"content-range": f"bytes */{size}"},
+                )
+        if byte_range is None:
+            return BlobResponse(
+                store.blob_path(digest), 0, size, headers=headers, media_type=media_type
+            )
+        start, end = byte_range
+        headers["content-range"] = f"bytes {start}-{end}/{size}"
+        return BlobResponse(
+            store.blob_path(digest), start, end - start + 1, 206, headers, media_type
+        )
+
+    return router
@@ -0,0 +1,423 @@
+"""Background media job scheduler.
+
+Jobs are persisted in SQLite so queued work survives restarts, picked in
+priority order subject to per-type concurrency limits, and executed in a
+``spawn``-based process pool so hashing, probing and transcoding never
+block the event loop. Queue, progress and completion events are pushed out
+through a ``notify`` callback as they happen.
+"""
+
+import asyncio
+import contextvars
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from fastapi import APIRouter, HTTPException, Query
+
+from common.constants import Endpoints, ErrorMessages
+from common.models import (
+    BlobRef,
+    Job,
+    JobCreate,
+    JobStatus,
+    JobType,
+    NotificationType,
+)
+from common.tracing import start_span, traced
+
+from . import media_tasks
+from .blobs import BlobStore
+
+JobNotifier = Callable[[NotificationType, Job], Awaitable[None]]
+JobRunner = Callable[[int, str, str, Dict, str], Dict]
+
+# Times a job may take its worker process down with it before it is failed
+# instead of requeued.
+MAX_WORKER_CRASHES = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    item_id INTEGER,
+    digest TEXT NOT NULL,
+    params TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, id);
+"""
+
+
+def default_limits(max_workers: int) -> Dict[JobType, int]:
+    """Concurrency per job type; ffmpeg transcodes are multi-threaded already."""
+    return {
+        JobType.PROBE: max_workers,
+        JobType.HASH: max_workers,
+        JobType.THUMBNAIL: max_workers,
+        JobType.TRANSCODE: max(1, max_workers // 4),
+    }
+
+
+class JobScheduler:
+    """Persistent priority queue feeding a process pool."""
+
+    def __init__(
+        self,
+        db_path: str,
+        blob_store: BlobStore,
+        notify: JobNotifier,
+        max_workers: Optional[int] = None,
+        limits: Optional[Dict[JobType, int]] = None,
+        runner: JobRunner = media_tasks.run_job,
+    ):
+        self.db_path = db_path
+        self.blob_store = blob_store
+        self.notify = notify
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.limits = limits or default_limits(self.max_workers)
+        self.runner = runner
+        self._running: Dict[JobType, int] = {job_type: 0 for job_type in JobType}
+        self._tasks: Set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._progress = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._crashes: Dict[int, int] = {}
+        # Context of the request that submitted each job, so its run, progress
+        # and completion stay in the submitter's trace.
+        self._contexts: Dict[int, contextvars.Context] = {}
+        self._run_contexts: Dict[int, contextvars.Context] = {}
+
+    async def start(self) -> None:
+        """Open the queue, requeue interrupted jobs and start dispatching."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._wakeup = asyncio.Event()
+        self._db = sqlite3.connect(self.db_path, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._requeue_running()
+
+        # Forking a process that runs an event loop and threads is unsafe.
+        self._progress = multiprocessing.get_context("spawn").Queue()
+        self._pool = self._create_pool()
+        loop = asyncio.get_running_loop()
+        threading.Thread(
+            target=self._pump_progress,
+            args=(loop, self._progress),
+            name="medialab-job-progress",
+            daemon=True,
+        ).start()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wakeup.set()
+
+    async def stop(self) -> None:
+        """Stop dispatching, kill running jobs and put them back in the queue."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        if self._pool is not None:
+            # shutdown() cannot interrupt a running job, so end the workers;
+            # an ffmpeg child dies of SIGPIPE once its parent is gone.
+            workers = list((self._pool._processes or {}).values())
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            for worker in workers:
+                worker.terminate()
+            for worker in workers:
+                worker.join(5)
+            self._pool = None
+        if self._progress is not None:
+            self._progress.put(None)
+            self._progress = None
+        if self._db is not None:
+            self._requeue_running()
+            self._db.close()
+            self._db = None
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=media_tasks.init_worker,
+            initargs=(self._progress,),
+        )
+
+    def _requeue_running(self) -> None:
+        self._db.execute(
+            "UPDATE jobs SET status = ?, progress = 0, started_at = NULL "
+            "WHERE status = ?",
+            (JobStatus.QUEUED.value, JobStatus.RUNNING.value),
+        )
+
+    def _row_to_job(self, row: sqlite3.Row) -> Job:
+        return Job(
+            id=row["id"],
+            type=row["type"],
+            status=row["status"],
+            priority=row["priority"],
+            item_id=row["item_id"],
+            digest=row["digest"],
+            params=json.loads(row["params"]),
+            progress=row["progress"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+        )
+
+    def get(self, job_id: int) -> Optional[Job]:
+        row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(
+        self, status: Optional[JobStatus] = None, limit: int = 100
+    ) -> List[Job]:
+        if status is None:
+            rows = self._db.execute(
+                "SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)
+            )
+        else:
+            rows = self._db.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?",
+                (status.value, limit),
+            )
+        return [self._row_to_job(row) for row in rows]
+
+    def _update(self, job_id: int, **fields) -> None:
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._db.execute(
+            f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id)
+        )
+
+    @traced("jobs.submit")
+    def submit(self, request: JobCreate) -> Job:
+        """Queue a job; ``request.digest`` must name a stored blob."""
+        if request.digest is None or not self.blob_store.exists(request.digest):
+            raise ValueError(request.digest)
+        cursor = self._db.execute(
+            "INSERT INTO jobs (type, status, priority, item_id, digest, params, "
+            "created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                request.type.value,
+                JobStatus.QUEUED.value,
+                request.priority,
+                request.item_id,
+                request.digest,
+                json.dumps(request.params),
+                datetime.now().isoformat(),
+            ),
+        )
+        job = self.get(cursor.lastrowid)
+        self._contexts[job.id] = contextvars.copy_context()
+        self._emit(NotificationType.JOB_QUEUED, job)
+        self._wakeup.set()
+        return job
+
+    def cancel(self, job_id: int) -> Job:
+        """Cancel a job that has not started yet."""
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job.status != JobStatus.QUEUED:
+            raise ValueError(job.status)
+        self._update(
+            job_id,
+            status=JobStatus.CANCELLED.value,
+            finished_at=datetime.now().isoformat(),
+        )
+        self._contexts.pop(job_id, None)
+        return self.get(job_id)
+
+    def _emit(self, event: NotificationType, job: Job) -> None:
+        task = asyncio.create_task(self.notify(event, job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _next_job(self) -> Optional[Job]:
+        if sum(self._running.values()) >= self.max_workers:
+            return None
+        available = [
+            job_type.value
+            for job_type, running in self._running.items()
+            if running < self.limits.get(job_type, self.max_workers)
+        ]
+        if not available:
+            return None
+        placeholders = ", ".join("?" for _ in available)
+        row = self._db.execute(
+            f"SELECT * FROM jobs WHERE status = ? AND type IN ({placeholders}) "
+            "ORDER BY priority DESC, id LIMIT 1",
+            (JobStatus.QUEUED.value, *available),
+        ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    async def _dispatch(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while (job := self._next_job()) is not None:
+                self._update(
+                    job.id,
+                    status=JobStatus.RUNNING.value,
+                    started_at=datetime.now().isoformat(),
+                )
+                self._running[job.type] += 1
+                # Tasks copy the context current when they are created.
+                context = self._contexts.get(job.id, contextvars.Context())
+                task = context.run(asyncio.create_task, self._run(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job: Job) -> None:
+        loop = asyncio.get_running_loop()
+        attributes = {"job.id": job.id, "job.type": job.type.value}
+        try:
+            with start_span("jobs.run", attributes=attributes) as span:
+                self._run_contexts[job.id] = contextvars.copy_context()
+                pool = self._pool
+                try:
+                    result = await loop.run_in_executor(
+                        pool,
+                        self.runner,
+                        job.id,
+                        job.type.value,
+                        self.blob_store.blob_path(job.digest),
+                        job.params,
+                        self.blob_store.root,
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except BrokenProcessPool:
+                    # A worker died (e.g. OOM-killed). Every job on the pool
+                    # fails with this, so replace it once and retry them.
+                    if self._pool is pool:
+                        self._pool = self._create_pool()
+                        pool.shutdown(wait=False, cancel_futures=True)
+                    crashes = self._crashes.get(job.id, 0) + 1
+                    if crashes < MAX_WORKER_CRASHES:
+                        self._crashes[job.id] = crashes
+                        span.set_attribute("job.requeued", True)
+                        self._update(
+                            job.id,
+                            status=JobStatus.QUEUED.value,
+                            progress=0,
+                            started_at=None,
+                        )
+                        return
+                    span.set_error("Worker process died")
+                    self._update(
+                        job.id,
+                        status=JobStatus.FAILED.value,
+                        error="Worker process died",
+                        finished_at=datetime.now().isoformat(),
+                    )
+                    self._emit(NotificationType.JOB_FAILED, self.get(job.id))
+                except Exception as e:
+                    span.set_error(str(e) or type(e).__name__)
+                    self._update(
+                        job.id,
+                        status=JobStatus.FAILED.value,
+                        error=str(e) or type(e).__name__,
+                        finished_at=datetime.now().isoformat(),
+                    )
+                    self._emit(NotificationType.JOB_FAILED, self.get(job.id))
+                else:
+                    self._update(
+                        job.id,
+                        status=JobStatus.COMPLETED.value,
+                        progress=1.0,
+                        result=json.dumps(result),
+                        finished_at=datetime.now().isoformat(),
+                    )
+                    self._emit(NotificationType.JOB_COMPLETED, self.get(job.id))
+                self._crashes.pop(job.id, None)
+                self._contexts.pop(job.id, None)
+        finally:
+            self._run_contexts.pop(job.id, None)
+            self._running[job.type] -= 1
+            self._wakeup.set()
+
+    def _pump_progress(self, loop: asyncio.AbstractEventLoop, queue) -> None:
+        # Blocking reads from the worker queue happen on this thread; updates
+        # are applied on the event loop.
+        while (message := queue.get()) is not None:
+            loop.call_soon_threadsafe(
+                self._on_progress, *message, context=self._run_contexts.get(message[0])
+            )
+
+    def _on_progress(self, job_id: int, progress: float) -> None:
+        if self._db is None:
+            return
+        job = self.get(job_id)
+        if job is None or job.status != JobStatus.RUNNING:
+            return
+        self._update(job_id, progress=progress)
+        self._emit(NotificationType.JOB_PROGRESS, self.get(job_id))
+
+
+def create_job_router(
+    scheduler: JobScheduler, find_blob: Callable[[int], Optional[BlobRef]]
+) -> APIRouter:
+    """Build the job API; ``find_blob`` resolves an item id to its blob."""
+    router = APIRouter(tags=["jobs"])
+
+    @router.post(Endpoints.SERVER_JOBS, response_model=Job, status_code=201)
+    async def create_job(request: JobCreate):
+        """Queue a media job for an item's blob or a blob digest."""
+        if request.digest is None and request.item_id is not None:
+            blob = find_blob(request.item_id)
+            if blob is None:
+                raise HTTPException(
+                    status_code=400, detail=ErrorMessages.JOB_ITEM_HAS_NO_BLOB
+                )
+            request.digest = blob.digest
+        try:
+            return scheduler.submit(request)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=ErrorMessages.BLOB_NOT_FOUND)
+
+    @router.get(Endpoints.SERVER_JOBS, response_model=List[Job])
+    async def get_jobs(
+        status: Optional[JobStatus] = None, limit: int = Query(100, ge=1, le=1000)
+    ):
+        """List recent jobs, newest first."""
+        return scheduler.list_jobs(status, limit)
+
+    @router.get(Endpoints.SERVER_JOB, response_model=Job)
+    async def get_job(job_id: int):
+        """Get a job's status, progress and result."""
+        job = scheduler.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=ErrorMessages.JOB_NOT_FOUND)
+        return job
+
+    @router.delete(Endpoints.SERVER_JOB, response_model=Job)
+    async def cancel_job(job_id: int):
+        """Cancel a queued job."""
+        try:
+            return scheduler.cancel(job_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=ErrorMessages.JOB_NOT_FOUND)
+        except ValueError:
+            raise HTTPException(
+                status_code=409, detail=ErrorMessages.JOB_NOT_CANCELLABLE
+            )
+
+    return router
@@ -1,11 +1,31 @@
+import os
 from datetime import datetime
 from typing import Dict, List, Optional
 
-import httpx
 import uvicorn
 from fastapi import BackgroundTasks, FastAPI, HTTPException
 from pydantic import BaseModel
 
+from common.constants import (
+    BLOB_DIR_ENV,
+    DEFAULT_BLOB_DIR,
+    DEFAULT_JOB_DB,
+    JOB_DB_ENV,
+    JOB_WORKERS_ENV,
+    ErrorMessages,
+)
+from common.models import BlobRef, Job, NotificationType
+from common.profiling import create_profiling_router
+from common.tracing import (
+    TracingMiddleware,
+    configure_tracing,
+    start_span,
+    traced_async_client,
+)
+
+from .blobs import BlobStore, create_blob_router
+from .jobs import JobScheduler, create_job_router
+
 # Client configuration
 CLIENT_PORT = 4810
 
@@ -14,6 +34,15 @@ app = FastAPI(
     description="API for MediaLab server application with client communication",
     version="1.0.0",
 )
+app.include_router(create_profiling_router({"items": lambda: items}))
+
+# Distributed tracing
+configure_tracing("medialab-server")
+app.add_middleware(TracingMiddleware)
+
+# Content-addressed media storage
+blob_store = BlobStore(os.environ.get(BLOB_DIR_ENV, DEFAULT_BLOB_DIR))
+app.include_router(create_blob_router(blob_store))
 
 
 # Data models
@@ -21,6 +50,7 @@ class Item(BaseModel):
     id: Optional[int] = None
     name: str
     description: Optional[str] = None
+    blob: Optional[BlobRef] = None
 
 
 class Notification(BaseModel):
@@ -38,15 +68,69 @@ current_id = 1
 
 async def notify_client(notification: Notification):
     """Send a notification to the client."""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"http://localhost:{CLIENT_PORT}/server-communication/notify",
-                json=notification.model_dump(),
-            )
-            response.raise_for_status()
-    except Exception as e:
-        print(f"Failed to notify client: {e}")
+    with start_span(
+        "notify_client", attributes={"notification.type": notification.type}
+    ) as span:
+        try:
+            async with traced_async_client() as client:
+                response = await client.post(
+                    f"http://localhost:{CLIENT_PORT}/server-communication/notify",
+                    json=notification.model_dump(mode="json"),
+                )
+                response.raise_for_status()
+        except Exception as e:
+            span.set_error(str(e))
+            print(f"Failed to notify client: {e}")
+
+
+async def notify_job(event: NotificationType, job: Job):
+    """Push a job lifecycle event to the client."""
+    await notify_client(
+        Notification(
+            message=f"Job {job.id} ({job.type.value}) {job.status.value}",
+            type=event.value,
+            data=job.model_dump(mode="json"),
+        )
+    )
+
+
+def find_item_blob(item_id: int) -> Optional[BlobRef]:
+    """Return the blob referenced by an item, if any."""
+    for item in items:
+        if item.id == item_id:
+            return item.blob
+    return None
+
+
+# Background media jobs
+job_scheduler = JobScheduler(
+    os.environ.get(JOB_DB_ENV, DEFAULT_JOB_DB),
+    blob_store,
+    notify_job,
+    max_workers=int(os.environ.get(JOB_WORKERS_ENV, 0)) or None,
+)
+app.include_router(create_job_router(job_scheduler, find_item_blob))
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Start the job scheduler."""
+    await job_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the job scheduler."""
+    await job_scheduler.stop()
+
+
+def check_blob(item: Item) -> None:
+    """Reject items that reference a blob the store does not hold."""
+    if item.blob is None:
+        return
+    if not blob_store.exists(item.blob.digest):
+        raise HTTPException(status_code=400, detail=ErrorMessages.BLOB_NOT_FOUND)
+    item.blob.size = blob_store.size(item.blob.digest)
 
 
 @app.get("/")
@@ -69,9 +153,10 @@ async def get_items():
 @app.get("/items/{item_id}", response_model=Item)
 async def get_item(item_id: int):
     """Get a specific item by ID."""
-    for item in items:
-        if item.id == item_id:
-            return item
+    with start_span("items.get", attributes={"item.id": item_id}):
+        for item in items:
+            if item.id == item_id:
+                return item
     raise HTTPException(status_code=404, detail="Item not found")
 
 
@@ -79,9 +164,11 @@ async def get_item(item_id: int):
 async def create_item(item: Item, background_tasks: BackgroundTasks):
     """Create a new item."""
     global current_id
-    item.id = current_id
-    current_id += 1
-    items.append(item)
+    check_blob(item)
+    with start_span("items.create"):
+        item.id = current_id
+        current_id += 1
+        items.append(item)
 
     # Notify the client about the new item
     notification = Notification(
@@ -99,39 +186,42 @@ async def update_item(
     item_id: int, updated_item: Item, background_tasks: BackgroundTasks
 ):
     """Update an existing item."""
-    for i, item in enumerate(items):
-        if item.id == item_id:
-            updated_item.id = item_id
-            items[i] = updated_item
-
-            # Notify the client about the update
-            notification = Notification(
-                message=f"Server updated item: {updated_item.name}",
-                type="server_item_updated",
-                data=updated_item.model_dump(),
-            )
-            background_tasks.add_task(notify_client, notification)
-
-            return updated_item
+    check_blob(updated_item)
+    with start_span("items.update", attributes={"item.id": item_id}):
+        for i, item in enumerate(items):
+            if item.id == item_id:
+                updated_item.id = item_id
+                items[i] = updated_item
+
+                # Notify the client about the update
+                notification = Notification(
+                    message=f"Server updated item: {updated_item.name}",
+                    type="server_item_updated",
+                    data=updated_item.model_dump(),
+                )
+                background_tasks.add_task(notify_client, notification)
+
+                return updated_item
     raise HTTPException(status_code=404, detail="Item not found")
 
 
 @app.delete("/items/{item_id}")
 async def delete_item(item_id: int, background_tasks: BackgroundTasks):
     """Delete an item."""
-    for i, item in enumerate(items):
-        if item.id == item_id:
-            items.pop(i)
-
-            # Notify the client about the deletion
-            notification = Notification(
-                message=f"Server deleted item with ID: {item_id}",
-                type="server_item_deleted",
-                data={"item_id": item_id},
-            )
-            background_tasks.add_task(notify_client, notification)
-
-            return {"message": "Item deleted successfully"}
+    with start_span("items.delete", attributes={"item.id": item_id}):
+        for i, item in enumerate(items):
+            if item.id == item_id:
+                items.pop(i)
+
+                # Notify the client about the deletion
+                notification = Notification(
+                    message=f"Server deleted item with ID: {item_id}",
+                    type="server_item_deleted",
+                    data={"item_id": item_id},
+                )
+                background_tasks.add_task(notify_client, notification)
+
+                return {"message": "Item deleted successfully"}
     raise HTTPException(status_code=404, detail="Item not found")
 
 
@@ -139,7 +229,7 @@ async def delete_item(item_id: int, background_tasks: BackgroundTasks):
 async def get_client_status():
     """Get the status of the client."""
     try:
-        async with httpx.AsyncClient() as client:
+        async with traced_async_client() as client:
             response = await client.get(
                 f"http://localhost:{CLIENT_PORT}/server-communication/status"
             )
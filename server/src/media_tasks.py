@@ -0,0 +1,212 @@
+"""CPU-bound media work executed inside the job scheduler's process pool.
+
+Everything here is synchronous and runs in worker processes, never on the
+event loop. Progress travels back to the scheduler over the queue handed to
+:func:`init_worker`; results must be JSON-serialisable dicts.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from .blobs import HASH_READ_SIZE, BlobStore
+
+# Minimum change in progress, or time since the last report, before a new
+# progress update is sent to the scheduler.
+PROGRESS_STEP = 0.05
+PROGRESS_INTERVAL = 2.0
+
+# Leading bytes used to recognise common media when ffprobe is unavailable.
+MAGIC_NUMBERS = [
+    (b"\x1a\x45\xdf\xa3", "video/x-matroska"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"OggS", "audio/ogg"),
+    (b"fLaC", "audio/flac"),
+    (b"ID3", "audio/mpeg"),
+]
+
+_progress_queue = None
+
+
+def init_worker(queue) -> None:
+    """Process pool initializer: remember where to send progress."""
+    global _progress_queue
+    _progress_queue = queue
+
+
+class ProgressReporter:
+    """Throttled progress callback for a single job."""
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.last_value = 0.0
+        self.last_time = time.monotonic()
+
+    def __call__(self, fraction: float) -> None:
+        fraction = min(max(fraction, 0.0), 1.0)
+        now = time.monotonic()
+        if (
+            fraction - self.last_value < PROGRESS_STEP
+            and now - self.last_time < PROGRESS_INTERVAL
+        ):
+            return
+        self.last_value, self.last_time = fraction, now
+        if _progress_queue is not None:
+            _progress_queue.put((self.job_id, fraction))
+
+
+def _require(tool: str) -> str:
+    path = shutil.which(tool)
+    if path is None:
+        raise RuntimeError(f"{tool} is not installed")
+    return path
+
+
+def _ffprobe(path: str) -> Dict:
+    output = subprocess.run(
+        [
+            _require("ffprobe"),
+            "-v",
+            "quiet",
+            "-print_format",
+            "json",
+            "-show_format",
+            "-show_streams",
+            path,
+        ],
+        check=True,
+        capture_output=True,
+    ).stdout
+    return json.loads(output)
+
+
+def _sniff(path: str) -> Optional[str]:
+    with open(path, "rb") as f:
+        head = f.read(16)
+    if head[4:8] == b"ftyp":
+        return "video/mp4"
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "audio/wav"
+    for magic, content_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return content_type
+    return None
+
+
+def probe(path: str, params: Dict, report: ProgressReporter, store: BlobStore) -> Dict:
+    """Extract container and stream metadata."""
+    result: Dict = {"size": os.path.getsize(path), "content_type": _sniff(path)}
+    if shutil.which("ffprobe"):
+        info = _ffprobe(path)
+        result["format"] = info.get("format", {})
+        result["streams"] = info.get("streams", [])
+    return result
+
+
+def hash_blob(
+    path: str, params: Dict, report: ProgressReporter, store: BlobStore
+) -> Dict:
+    """Re-hash a blob to verify it and compute secondary digests."""
+    size = os.path.getsize(path)
+    sha256, md5 = hashlib.sha256(), hashlib.md5()
+    done = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_READ_SIZE):
+            sha256.update(chunk)
+            md5.update(chunk)
+            done += len(chunk)
+            report(done / size if size else 1.0)
+    digest = sha256.hexdigest()
+    return {
+        "sha256": digest,
+        "md5": md5.hexdigest(),
+        "verified": digest == os.path.basename(path),
+    }
+
+
+def thumbnail(
+    path: str, params: Dict, report: ProgressReporter, store: BlobStore
+) -> Dict:
+    """Render a JPEG thumbnail into the blob store."""
+    width = int(params.get("width", 320))
+    offset = float(params.get("time", 1.0))
+    workdir = tempfile.mkdtemp(dir=store.uploads_dir)
+    try:
+        output = os.path.join(workdir, "thumbnail.jpg")
+        command = [_require("ffmpeg"), "-v", "error", "-y"]
+        if offset > 0:
+            command += ["-ss", str(offset)]
+        command += ["-i", path, "-frames:v", "1", "-vf", f"scale={width}:-2", output]
+        subprocess.run(command, check=True, capture_output=True)
+        return {"blob": store.add_file(output, "image/jpeg").model_dump()}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def transcode(
+    path: str, params: Dict, report: ProgressReporter, store: BlobStore
+) -> Dict:
+    """Transcode to H.264/AAC MP4 (optionally scaled) into the blob store."""
+    duration = float(_ffprobe(path).get("format", {}).get("duration") or 0)
+    workdir = tempfile.mkdtemp(dir=store.uploads_dir)
+    try:
+        output = os.path.join(workdir, "output.mp4")
+        command: List[str] = [
+            _require("ffmpeg"),
+            "-v",
+            "error",
+            "-nostats",
+            "-y",
+            "-progress",
+            "pipe:1",
+            "-i",
+            path,
+            "-c:v",
+            str(params.get("video_codec", "libx264")),
+            "-preset",
+            str(params.get("preset", "medium")),
+            "-c:a",
+            str(params.get("audio_codec", "aac")),
+            "-movflags",
+            "+faststart",
+        ]
+        if "height" in params:
+            command += ["-vf", f"scale=-2:{int(params['height'])}"]
+        command.append(output)
+        with open(os.path.join(workdir, "ffmpeg.log"), "w+") as log:
+            process = subprocess.Popen(
+                command, stdout=subprocess.PIPE, stderr=log, text=True
+            )
+            for line in process.stdout:
+                key, _, value = line.strip().partition("=")
+                if key == "out_time_us" and duration and value.isdigit():
+                    report(int(value) / 1_000_000 / duration)
+            if process.wait() != 0:
+                log.seek(0)
+                raise RuntimeError(log.read().strip() or "ffmpeg failed")
+        return {"blob": store.add_file(output, "video/mp4").model_dump()}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+TASKS: Dict[str, Callable[[str, Dict, ProgressReporter, BlobStore], Dict]] = {
+    "probe": probe,
+    "hash": hash_blob,
+    "thumbnail": thumbnail,
+    "transcode": transcode,
+}
+
+
+def run_job(
+    job_id: int, job_type: str, path: str, params: Dict, blob_root: str
+) -> Dict:
+    """Entry point submitted to the process pool."""
+    task = TASKS[job_type]
+    return task(path, params, ProgressReporter(job_id), BlobStore(blob_root))
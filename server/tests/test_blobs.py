@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import os
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.blobs import (
+    BlobResponse,
+    BlobStore,
+    UploadOffsetMismatch,
+    create_blob_router,
+    parse_range,
+)
+
+DATA = bytes(range(256)) * 64
+DIGEST = hashlib.sha256(DATA).hexdigest()
+
+
+async def stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path))
+
+
+@pytest.fixture
+def client(store):
+    app = FastAPI()
+    app.include_router(create_blob_router(store))
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=-5000", (0, 999)),
+        ("bytes=990-5000", (990, 999)),
+        ("bytes=5-1", None),
+        ("bytes=0-1,5-6", None),
+        ("items=0-1", None),
+        ("bytes=a-b", None),
+        ("bytes=10", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=2000-3000", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+async def test_append_rejects_wrong_offset(store):
+    upload_id = store.create_upload()
+    assert await store.append(upload_id, 0, stream(DATA[:100])) == 100
+    with pytest.raises(UploadOffsetMismatch) as e:
+        await store.append(upload_id, 50, stream(DATA[100:]))
+    assert e.value.offset == 100
+    assert store.upload_offset(upload_id) == 100
+
+
+async def test_resume_after_restart_rebuilds_digest(store, tmp_path):
+    upload_id = store.create_upload()
+    await store.append(upload_id, 0, stream(DATA[:1000], DATA[1000:4000]))
+
+    restarted = BlobStore(str(tmp_path))
+    await restarted.append(upload_id, 4000, stream(DATA[4000:]))
+    blob = await restarted.commit(upload_id, DIGEST, "video/mp4")
+
+    assert (blob.digest, blob.size, blob.content_type) == (
+        DIGEST,
+        len(DATA),
+        "video/mp4",
+    )
+    with open(restarted.blob_path(DIGEST), "rb") as f:
+        assert f.read() == DATA
+    assert not os.path.exists(restarted.upload_path(upload_id))
+
+
+async def test_commit_rejects_digest_mismatch(store):
+    upload_id = store.create_upload()
+    await store.append(upload_id, 0, stream(DATA))
+    with pytest.raises(ValueError):
+        await store.commit(upload_id, "0" * 64)
+    assert not store.exists(DIGEST)
+    assert store.upload_offset(upload_id) == len(DATA)
+
+
+async def test_commit_deduplicates_and_keeps_first_content_type(store):
+    for content_type in ("video/mp4", "application/x-other"):
+        upload_id = store.create_upload()
+        await store.append(upload_id, 0, stream(DATA))
+        blob = await store.commit(upload_id, content_type=content_type)
+        assert blob.content_type == "video/mp4"
+    assert sorted(os.listdir(os.path.dirname(store.blob_path(DIGEST)))) == [
+        DIGEST,
+        f"{DIGEST}.json",
+    ]
+    assert os.listdir(store.uploads_dir) == []
+
+
+async def test_sweep_removes_only_stale_uploads(store):
+    stale, fresh = store.create_upload(), store.create_upload()
+    old = time.time() - store.upload_ttl - 60
+    os.utime(store.upload_path(stale), (old, old))
+
+    assert store.sweep_uploads() == 1
+    assert os.listdir(store.uploads_dir) == [fresh]
+    assert stale not in store._hashers
+    assert store.sweep_uploads(force=True) == 0
+    assert os.listdir(store.uploads_dir) == [fresh]
+
+
+def test_upload_and_download(client):
+    upload_id = client.post("/blobs/uploads").json()["upload_id"]
+    response = client.patch(
+        f"/blobs/uploads/{upload_id}", content=DATA[:10], headers={"Upload-Offset": "0"}
+    )
+    assert response.json()["offset"] == 10
+    response = client.patch(
+        f"/blobs/uploads/{upload_id}", content=DATA[10:], headers={"Upload-Offset": "0"}
+    )
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "10"
+    client.patch(
+        f"/blobs/uploads/{upload_id}",
+        content=DATA[10:],
+        headers={"Upload-Offset": "10"},
+    )
+    response = client.post(
+        f"/blobs/uploads/{upload_id}/commit",
+        params={"digest": DIGEST, "content_type": "image/png"},
+    )
+    assert response.json()["content_type"] == "image/png"
+
+    response = client.get(f"/blobs/{DIGEST}")
+    assert response.content == DATA
+    assert response.headers["content-type"] == "image/png"
+
+    response = client.head(f"/blobs/{DIGEST}")
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["content-length"] == str(len(DATA))
+
+    response = client.get(f"/blobs/{DIGEST}", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.content == DATA[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(DATA)}"
+
+    response = client.get(f"/blobs/{DIGEST}", headers={"Range": "bytes=99999-"})
+    assert response.status_code == 416
+
+
+def test_download_without_content_type(client, store):
+    path = os.path.join(store.uploads_dir, "raw")
+    with open(path, "wb") as f:
+        f.write(DATA)
+    store.add_file(path)
+    response = client.get(f"/blobs/{DIGEST}")
+    assert response.headers["content-type"] == "application/octet-stream"
+
+
+async def test_zerocopy_send_passes_file_object(store):
+    path = os.path.join(store.uploads_dir, "raw")
+    with open(path, "wb") as f:
+        f.write(DATA)
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "extensions": {"http.response.zerocopysend": {}},
+    }
+    messages = []
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.zerocopysend":
+            message = {**message, "file": message["file"].fileno()}
+        messages.append(message)
+
+    await BlobResponse(path, 100, 50)(scope, receive, send)
+    zerocopy = messages[1]
+    assert zerocopy["type"] == "http.response.zerocopysend"
+    assert (zerocopy["offset"], zerocopy["count"]) == (100, 50)
+    assert isinstance(zerocopy["file"], int)
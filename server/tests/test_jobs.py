@@ -0,0 +1,222 @@
+import asyncio
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import pytest
+
+from common.models import JobCreate, JobStatus, JobType, NotificationType
+from common.tracing import current_span, start_span
+from src import media_tasks
+from src.blobs import BlobStore
+from src.jobs import SCHEMA, JobScheduler
+
+FINISHED = (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+def fake_runner(job_id, job_type, path, params, blob_root):
+    """Stand-in for ``media_tasks.run_job`` executed in the worker pool."""
+    crash_marker = params.get("crash")
+    if crash_marker and not os.path.exists(crash_marker):
+        open(crash_marker, "w").close()
+        os._exit(1)
+    media_tasks.ProgressReporter(job_id)(0.5)
+    time.sleep(params.get("sleep", 0.2))
+    if params.get("fail"):
+        raise RuntimeError("boom")
+    return {"type": job_type}
+
+
+@pytest.fixture
+def blob_store(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    path = os.path.join(store.uploads_dir, "source")
+    with open(path, "wb") as f:
+        f.write(b"media")
+    store.digest = store.add_file(path).digest
+    return store
+
+
+@pytest.fixture
+def events():
+    return []
+
+
+@pytest.fixture
+def traces():
+    return []
+
+
+@pytest.fixture
+async def make_scheduler(tmp_path, blob_store, events, traces):
+    schedulers = []
+
+    async def notify(event, job):
+        events.append((event, job.id))
+        span = current_span()
+        traces.append((event, span.context.trace_id if span else None))
+
+    def make(**kwargs):
+        scheduler = JobScheduler(
+            str(tmp_path / "jobs.sqlite3"),
+            blob_store,
+            notify,
+            runner=fake_runner,
+            **kwargs,
+        )
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        if scheduler._db is not None:
+            await scheduler.stop()
+
+
+def submit(scheduler, job_type=JobType.HASH, priority=0, **params):
+    request = JobCreate(
+        type=job_type,
+        digest=scheduler.blob_store.digest,
+        priority=priority,
+        params=params,
+    )
+    return scheduler.submit(request).id
+
+
+async def wait_for(scheduler, *job_ids, statuses=FINISHED, timeout=30):
+    deadline = time.monotonic() + timeout
+    while any(scheduler.get(job_id).status not in statuses for job_id in job_ids):
+        assert time.monotonic() < deadline, "timed out waiting for jobs"
+        await asyncio.sleep(0.05)
+    # Let the notification tasks run.
+    await asyncio.sleep(0.05)
+
+
+async def test_jobs_run_in_priority_order(make_scheduler):
+    scheduler = make_scheduler(max_workers=1)
+    await scheduler.start()
+    low = submit(scheduler, priority=-5, sleep=0)
+    first = submit(scheduler, sleep=0)
+    high = submit(scheduler, priority=5, sleep=0)
+    second = submit(scheduler, sleep=0)
+    await wait_for(scheduler, low, first, high, second)
+
+    jobs = sorted(scheduler.list_jobs(), key=lambda job: job.started_at)
+    assert [job.id for job in jobs] == [high, first, second, low]
+    assert all(job.status == JobStatus.COMPLETED for job in jobs)
+
+
+async def test_per_type_limits(make_scheduler):
+    scheduler = make_scheduler(max_workers=2, limits={JobType.HASH: 1})
+    await scheduler.start()
+    hash1 = submit(scheduler, sleep=0.5)
+    hash2 = submit(scheduler, sleep=0)
+    probe = submit(scheduler, JobType.PROBE, sleep=0)
+    await wait_for(scheduler, hash1, hash2, probe)
+
+    hash1, hash2, probe = (scheduler.get(i) for i in (hash1, hash2, probe))
+    assert hash2.started_at >= hash1.finished_at
+    assert probe.started_at < hash2.started_at
+
+
+async def test_start_requeues_interrupted_jobs(make_scheduler, blob_store, tmp_path):
+    db = sqlite3.connect(tmp_path / "jobs.sqlite3", isolation_level=None)
+    db.executescript(SCHEMA)
+    db.execute(
+        "INSERT INTO jobs (type, status, digest, params, progress, created_at, "
+        "started_at) VALUES ('hash', 'running', ?, '{}', 0.5, ?, ?)",
+        (blob_store.digest, datetime.now().isoformat(), datetime.now().isoformat()),
+    )
+    db.close()
+
+    scheduler = make_scheduler(max_workers=1)
+    await scheduler.start()
+    job = scheduler.get(1)
+    assert (job.status, job.progress, job.started_at) == (JobStatus.QUEUED, 0, None)
+    await wait_for(scheduler, 1)
+    assert scheduler.get(1).status == JobStatus.COMPLETED
+
+
+async def test_only_queued_jobs_can_be_cancelled(make_scheduler, events):
+    scheduler = make_scheduler(max_workers=1)
+    await scheduler.start()
+    running = submit(scheduler, sleep=0.5)
+    queued = submit(scheduler)
+    await wait_for(scheduler, running, statuses=(JobStatus.RUNNING,))
+
+    assert scheduler.cancel(queued).status == JobStatus.CANCELLED
+    with pytest.raises(ValueError):
+        scheduler.cancel(running)
+    with pytest.raises(KeyError):
+        scheduler.cancel(999)
+
+    await wait_for(scheduler, running)
+    assert scheduler.get(running).status == JobStatus.COMPLETED
+    assert scheduler.get(queued).status == JobStatus.CANCELLED
+    assert scheduler.get(queued).started_at is None
+
+
+async def test_notification_sequence(make_scheduler, events):
+    scheduler = make_scheduler(max_workers=1)
+    await scheduler.start()
+    ok = submit(scheduler)
+    failing = submit(scheduler, fail=True)
+    await wait_for(scheduler, ok, failing)
+
+    assert [event for event, job_id in events if job_id == ok] == [
+        NotificationType.JOB_QUEUED,
+        NotificationType.JOB_PROGRESS,
+        NotificationType.JOB_COMPLETED,
+    ]
+    assert [event for event, job_id in events if job_id == failing] == [
+        NotificationType.JOB_QUEUED,
+        NotificationType.JOB_PROGRESS,
+        NotificationType.JOB_FAILED,
+    ]
+    assert scheduler.get(failing).error == "boom"
+
+
+async def test_dead_worker_requeues_job_on_new_pool(make_scheduler, events, tmp_path):
+    scheduler = make_scheduler(max_workers=1)
+    await scheduler.start()
+    job_id = submit(scheduler, crash=str(tmp_path / "crashed"))
+    await wait_for(scheduler, job_id)
+
+    assert scheduler.get(job_id).status == JobStatus.COMPLETED
+    assert NotificationType.JOB_FAILED not in [event for event, _ in events]
+    later = submit(scheduler)
+    await wait_for(scheduler, later)
+    assert scheduler.get(later).status == JobStatus.COMPLETED
+
+
+async def test_stop_kills_running_jobs_and_requeues_them(make_scheduler):
+    scheduler = make_scheduler(max_workers=1)
+    await scheduler.start()
+    job_id = submit(scheduler, sleep=60)
+    await wait_for(scheduler, job_id, statuses=(JobStatus.RUNNING,))
+    workers = list(scheduler._pool._processes.values())
+
+    started = time.monotonic()
+    await scheduler.stop()
+    assert time.monotonic() - started < 10
+    assert not any(worker.is_alive() for worker in workers)
+
+    db = sqlite3.connect(scheduler.db_path)
+    assert db.execute("SELECT status FROM jobs").fetchone() == ("queued",)
+    db.close()
+
+
+async def test_job_notifications_stay_in_submitting_trace(make_scheduler, traces):
+    scheduler = make_scheduler(max_workers=1)
+    await scheduler.start()
+    with start_span("request") as request:
+        job_id = submit(scheduler)
+    await wait_for(scheduler, job_id)
+
+    assert [event for event, _ in traces] == [
+        NotificationType.JOB_QUEUED,
+        NotificationType.JOB_PROGRESS,
+        NotificationType.JOB_COMPLETED,
+    ]
+    assert {trace_id for _, trace_id in traces} == {request.context.trace_id}